@@ -0,0 +1,142 @@
+import asyncio
+import os
+import re
+import threading
+import time
+import numpy as np
+
+# --- Answer cache configuration ---
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") != "0"
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+class AnswerCache:
+    """
+    In-process cache of query results keyed by (source_id, normalized question, top_k).
+    Entries live no longer than the document itself and are dropped with it on cleanup.
+    In semantic mode a question whose embedding is within `similarity` (cosine) of a
+    cached question for the same source and top_k reuses that answer.
+    """
+
+    def __init__(self, ttl_s: float, semantic: bool = False, similarity: float = 0.95, max_entries: int = 10000):
+        self.ttl_s = ttl_s
+        self.semantic = semantic
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: dict[tuple, tuple[float, dict]] = {}
+        self._vectors: dict[tuple, list[tuple[np.ndarray, tuple]]] = {}
+
+    @staticmethod
+    def key(source_id: str, question: str, top_k: int) -> tuple:
+        return (source_id, normalize_question(question), int(top_k))
+
+    def _live(self, key: tuple, now: float) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= now:
+            self._entries.pop(key, None)
+            return None
+        return result
+
+    def get(self, source_id: str, question: str, top_k: int) -> dict | None:
+        with self._lock:
+            result = self._live(self.key(source_id, question, top_k), time.time())
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def get_similar(self, source_id: str, top_k: int, query_vector) -> dict | None:
+        if not self.semantic:
+            return None
+
+        q = np.asarray(query_vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        now = time.time()
+        with self._lock:
+            candidates = [(vec, key) for vec, key in self._vectors.get((source_id, int(top_k)), []) if self._live(key, now)]
+            self._vectors[(source_id, int(top_k))] = candidates
+            if not candidates:
+                return None
+
+            scores = np.stack([vec for vec, _ in candidates]) @ q
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                return None
+            self.semantic_hits += 1
+            return self._entries[candidates[best][1]][1]
+
+    def put(self, source_id: str, question: str, top_k: int, result: dict, query_vector=None):
+        key = self.key(source_id, question, top_k)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict(time.time())
+            self._entries[key] = (time.time() + self.ttl_s, result)
+
+            if self.semantic and query_vector is not None:
+                vec = np.asarray(query_vector, dtype=np.float32)
+                vec /= np.linalg.norm(vec) or 1.0
+                self._vectors.setdefault((source_id, int(top_k)), []).append((vec, key))
+
+    def _evict(self, now: float):
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        # Still full: drop the entries closest to expiry.
+        overflow = len(self._entries) - self.max_entries + 1
+        if overflow > 0:
+            for key in sorted(self._entries, key=lambda k: self._entries[k][0])[:overflow]:
+                del self._entries[key]
+
+    def invalidate_source(self, source_id: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == source_id]:
+                del self._entries[key]
+            for key in [k for k in self._vectors if k[0] == source_id]:
+                del self._vectors[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "semantic_hits": self.semantic_hits, "misses": self.misses, "entries": len(self._entries)}
+
+class Singleflight:
+    """
+    Coalesces concurrent calls with the same key so only one of them does the work;
+    the others await the leader's result (or exception).
+    """
+
+    def __init__(self):
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    async def do(self, key: tuple, fn):
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved so a failure nobody else awaited is not logged as unhandled.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
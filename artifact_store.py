@@ -0,0 +1,85 @@
+import hashlib
+import io
+import os
+import time
+import numpy as np
+from custom_types import RAGArtifactHandle, RAGChunkMeta
+
+# --- Artifact store configuration ---
+# Must be shared by every worker serving Inngest steps (a local disk is enough for one host).
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", ".cache/artifacts")
+# Artifacts left behind by runs that never finished are removed after this long.
+ARTIFACT_TTL_S = float(os.getenv("ARTIFACT_TTL_S", "3600"))
+
+class ArtifactStore:
+    """
+    Content-addressed files for data passed between steps, so Inngest only stores and
+    replays a small handle (path, digest, count) instead of the data itself.
+    Chunks are kept as one UTF-8 blob plus an offsets array and a (page, start, end)
+    array in an uncompressed .npz, which loads without any per-chunk JSON parsing.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR, ttl_s: float = ARTIFACT_TTL_S):
+        self.root = root
+        self.ttl_s = ttl_s
+        os.makedirs(root, exist_ok=True)
+
+    def put_chunks(self, chunks: list[str], metas: list[RAGChunkMeta] = None, source_id: str = None) -> RAGArtifactHandle:
+        encoded = [c.encode("utf-8") for c in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        spans = np.array([(m.page, m.start, m.end) for m in metas or []], dtype=np.int64).reshape(-1, 3)
+
+        buffer = io.BytesIO()
+        np.savez(buffer, text=np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets=offsets, metas=spans)
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+
+        # Content-addressed, so a retried step rewrites the same file. An existing one is
+        # touched instead, so sweep() does not remove it while this run still needs it.
+        path = os.path.join(self.root, f"{digest}.npz")
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        return RAGArtifactHandle(path=path, digest=digest, count=len(chunks), nbytes=len(data), source_id=source_id)
+
+    def get_chunks(self, handle: RAGArtifactHandle) -> tuple[list[str], list[RAGChunkMeta]]:
+        with open(handle.path, "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != handle.digest:
+            raise ValueError(f"Artifact {handle.path} does not match its digest")
+
+        with np.load(io.BytesIO(data)) as arrays:
+            text = arrays["text"].tobytes()
+            offsets = arrays["offsets"]
+            spans = arrays["metas"]
+
+        chunks = [text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(handle.count)]
+        metas = [RAGChunkMeta(page=int(p), start=int(s), end=int(e)) for p, s, e in spans]
+        return chunks, metas
+
+    def delete(self, handle: RAGArtifactHandle):
+        try:
+            os.remove(handle.path)
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, now: float = None) -> int:
+        """
+        Removes artifacts older than the TTL. Returns how many were removed.
+        """
+        cutoff = (now or time.time()) - self.ttl_s
+        removed = 0
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
@@ -0,0 +1,171 @@
+"""
+Chunking throughput of the native SentenceChunker vs llama_index's SentenceSplitter, and a
+chunk-boundary parity check between the two.
+
+    python benchmarks/bench_chunker.py                          # synthetic 200-page PDF
+    python benchmarks/bench_chunker.py --pdf paper.pdf --pdf manual.pdf
+    python benchmarks/bench_chunker.py --corpus docstrings --min-start-match 0.8
+
+Texts are extracted once up front, so only chunking is timed (best of --repeat). Each
+corpus is chunked page by page, as ingest does, and as one document, which makes long
+texts go through the sentence/clause splitting and the overlap logic.
+
+Parity is measured against SentenceSplitter's chunks: how many of its chunks the native
+chunker reproduces exactly, how many start within --tolerance characters of one of its
+chunk starts, how many chunks of each start at a sentence boundary (per nltk's punkt
+tokenizer, which SentenceSplitter splits with), and chunk sizes counted with the real
+tokenizer (native chunks must not exceed the chunk size). On long texts the estimated
+token counts make boundaries drift apart after a few chunks, so there the sentence
+alignment is the meaningful comparison. --min-start-match exits non-zero below the given
+fraction (use it with per-page chunking, as ingest does).
+"""
+import argparse
+import bisect
+import inspect
+import importlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fakes import make_pdf
+from pdf_parsing import get_splitter, CHUNK_SIZE, CHUNKERS
+
+_DOC_MODULES = ["argparse", "asyncio", "collections", "csv", "datetime", "decimal", "email", "functools",
+                "http.client", "inspect", "itertools", "json", "logging", "os", "pathlib", "re", "shutil",
+                "socket", "sqlite3", "ssl", "statistics", "string", "subprocess", "tarfile", "textwrap",
+                "threading", "typing", "unittest", "zipfile"]
+
+def pdf_pages(path: str) -> list[str]:
+    import pypdf
+
+    return [page.extract_text() for page in pypdf.PdfReader(path).pages]
+
+def docstring_pages(page_chars: int = 4000) -> list[str]:
+    # Real English prose with abbreviations, code and lists, cut into page-sized texts.
+    docs = {}
+    for name in _DOC_MODULES:
+        for _, obj in inspect.getmembers(importlib.import_module(name)):
+            doc = inspect.getdoc(obj)
+            if doc and len(doc) > 200:
+                docs[doc] = None
+    text = "\n\n".join(docs)
+    return [text[i:i + page_chars] for i in range(0, len(text), page_chars)]
+
+def chunk_all(chunker: str, texts: list[str]) -> list[list[tuple[int, int]]]:
+    """
+    (start, end) spans per text. SentenceSplitter chunks are located in the text the same
+    way pdf_parsing.locate_chunks does.
+    """
+    splitter = get_splitter(chunker)
+    if chunker == "native":
+        return [splitter.split_spans(t) for t in texts]
+    spans = []
+    for text in texts:
+        cursor, found = 0, []
+        for chunk in (splitter.split_text(text) if text else []):
+            start = text.find(chunk, cursor)
+            start = start if start >= 0 else text.find(chunk)
+            found.append((start, start + len(chunk)))
+            cursor = start + 1
+        spans.append(found)
+    return spans
+
+def throughput(chunker: str, texts: list[str], repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        spans = chunk_all(chunker, texts)
+        best = min(best, time.perf_counter() - start)
+    chars = sum(len(t) for t in texts)
+    return {"seconds": best, "texts_per_s": len(texts) / best, "mb_per_s": chars / best / 1e6,
+            "chunks": sum(len(s) for s in spans)}
+
+def parity(texts: list[str], reference: list[list[tuple[int, int]]], native: list[list[tuple[int, int]]], tolerance: int) -> dict:
+    from llama_index.core.utils import get_tokenizer, globals_helper
+
+    tokenizer = get_tokenizer()
+    exact = near = total = 0
+    ref_aligned = native_aligned = 0
+    ref_tokens, native_tokens = [], []
+    for text, ref, own in zip(texts, reference, native):
+        sentence_starts = {start for start, _ in globals_helper.punkt_tokenizer.span_tokenize(text)}
+        ref_aligned += sum(start in sentence_starts for start, _ in ref)
+        native_aligned += sum(start in sentence_starts for start, _ in own)
+        own_spans = set(own)
+        own_starts = sorted(start for start, _ in own)
+        for start, end in ref:
+            total += 1
+            exact += (start, end) in own_spans
+            i = bisect.bisect_left(own_starts, start - tolerance)
+            near += i < len(own_starts) and own_starts[i] <= start + tolerance
+            ref_tokens.append(len(tokenizer(text[start:end])))
+        native_tokens.extend(len(tokenizer(text[start:end])) for start, end in own)
+    return {
+        "reference_chunks": total,
+        "native_chunks": len(native_tokens),
+        "exact_match": exact / total if total else 1.0,
+        "start_match": near / total if total else 1.0,
+        "reference_sentence_aligned": ref_aligned / total if total else 1.0,
+        "native_sentence_aligned": native_aligned / len(native_tokens) if native_tokens else 1.0,
+        "reference_mean_tokens": statistics.fmean(ref_tokens) if ref_tokens else 0.0,
+        "native_mean_tokens": statistics.fmean(native_tokens) if native_tokens else 0.0,
+        "native_max_tokens": max(native_tokens, default=0),
+        "native_oversize": sum(t > CHUNK_SIZE for t in native_tokens),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="pdf", choices=["pdf", "docstrings"])
+    parser.add_argument("--pages", type=int, default=200, help="pages of the synthetic PDF (--corpus pdf)")
+    parser.add_argument("--pdf", action="append", help="chunk this PDF instead (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=int, default=50, help="characters a chunk start may be off by")
+    parser.add_argument("--min-start-match", type=float, help="fail if fewer chunk starts than this match")
+    args = parser.parse_args()
+
+    if args.pdf:
+        pages = [page for path in args.pdf for page in pdf_pages(path)]
+    elif args.corpus == "pdf":
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.pdf")
+            make_pdf(path, args.pages)
+            pages = pdf_pages(path)
+    else:
+        pages = docstring_pages()
+    units = {"page": pages, "document": ["\n".join(pages)]}
+
+    for chunker in CHUNKERS:
+        start = time.perf_counter()
+        get_splitter(chunker).split_text("Warm up. " * 50)
+        print(f"{chunker:<12} first use (import + setup): {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    failed = False
+    for unit, texts in units.items():
+        print(f"\nchunked per {unit}: {len(texts)} texts, {sum(len(t) for t in texts) / 1e6:.2f} MB")
+        print(f"  {'chunker':<12}{'seconds':>10}{'texts/s':>12}{'MB/s':>10}{'chunks':>10}")
+        results = {}
+        for chunker in CHUNKERS:
+            r = results[chunker] = throughput(chunker, texts, args.repeat)
+            print(f"  {chunker:<12}{r['seconds']:>10.3f}{r['texts_per_s']:>12.1f}{r['mb_per_s']:>10.2f}{r['chunks']:>10}")
+        print(f"  speedup {results['llama_index']['seconds'] / results['native']['seconds']:.1f}x")
+
+        p = parity(texts, chunk_all("llama_index", texts), chunk_all("native", texts), args.tolerance)
+        print(f"  parity: {p['native_chunks']} native vs {p['reference_chunks']} reference chunks, "
+              f"{p['exact_match']:.1%} identical, {p['start_match']:.1%} start within {args.tolerance} chars")
+        print(f"          sentence-aligned starts {p['native_sentence_aligned']:.1%} native vs "
+              f"{p['reference_sentence_aligned']:.1%} reference")
+        print(f"          mean tokens {p['native_mean_tokens']:.0f} native vs {p['reference_mean_tokens']:.0f} reference, "
+              f"native max {p['native_max_tokens']} ({p['native_oversize']} over {CHUNK_SIZE})")
+        if unit == "page" and args.min_start_match is not None and p["start_match"] < args.min_start_match:
+            failed = True
+
+    if failed:
+        print(f"\nchunk starts matched below {args.min_start_match:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Concurrent query throughput of a single worker: N rag/query_pdf_ai runs in flight at once
+on one event loop, as Inngest drives a worker that receives many step requests.
+
+    python benchmarks/bench_concurrent_queries.py                        # concurrency 1,8,32,64
+    python benchmarks/bench_concurrent_queries.py --concurrency 1,64,256 --queries 512
+    python benchmarks/bench_concurrent_queries.py --baseline-ref HEAD~1   # before/after
+
+Gemini is replaced by the fake client from fakes.py (sync calls sleep, aio calls await),
+Qdrant by QdrantClient(":memory:") unless --qdrant-url points at a server, and Inngest by a
+context that runs steps inline. Queries are spread round-robin over --sessions source ids
+leasing the same document, like many users asking at once (the scheduler caps concurrent
+calls per source id). For every concurrency level the report shows queries/s,
+latency percentiles and event-loop lag: how late a 10 ms timer on the same loop fires,
+i.e. how long the loop was blocked and unable to serve anything else.
+
+--baseline-ref runs the same load against a git worktree of an earlier revision (in a
+separate process, with this script's fakes) and prints both side by side.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+
+def _configure_env(args):
+    # Must run before the pipeline modules are imported: they read configuration at import time.
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ["QDRANT_URL"] = args.qdrant_url
+    os.environ["QDRANT_COLLECTION"] = f"bench_concurrency_{uuid.uuid4().hex[:8]}"
+    os.environ["EMBED_CACHE"] = "0"
+    os.environ["ANSWER_CACHE"] = "0"
+    os.environ["WARMUP_ON_START"] = "0"
+    os.environ["DOC_REGISTRY_PATH"] = os.path.join(tempfile.gettempdir(), f"rag-bench-docs-{uuid.uuid4().hex[:8]}.sqlite3")
+
+async def _lag_probe(stop: asyncio.Event, samples: list[float], interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+async def run_level(source_ids: list[str], chunks: list[str], n: int, concurrency: int, top_k: int) -> dict:
+    import main
+    from fakes import FakeContext, function_body
+    from run_suite import latency_summary, percentile
+
+    handler = function_body(main.rag_query_pdf_ai)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lag = [], []
+
+    async def _one(i: int):
+        # Distinct questions, so neither the answer cache nor singleflight can merge them.
+        sentence = chunks[(i * 7) % len(chunks)].split(".")[0]
+        ctx = FakeContext({"question": f"C{concurrency}-Q{i}: what does it say about {sentence}?", "top_k": top_k,
+                           "source_id": source_ids[i % len(source_ids)]})
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(ctx)
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_lag_probe(stop, lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(n)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await probe
+    return {**latency_summary(latencies), "concurrency": concurrency, "queries": n, "seconds": wall,
+            "queries_per_s": n / wall, "loop_lag_p99_ms": percentile(lag, 99) * 1000,
+            "loop_lag_max_ms": max(lag, default=0.0) * 1000}
+
+async def run_load(args) -> dict:
+    import main
+    from fakes import FakeContext, function_body, make_pdf
+    from data_loader import load_and_chunk_pdf
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench.pdf")
+        make_pdf(pdf_path, args.pages)
+        # Uploads are deduplicated by content, so only the first session indexes the document.
+        source_ids = [f"{uuid.uuid4()}--bench.pdf" for _ in range(args.sessions)]
+        for source_id in source_ids:
+            await function_body(main.rag_ingest_pdf)(FakeContext({"pdf_path": pdf_path, "source_id": source_id}))
+        chunks = load_and_chunk_pdf(pdf_path)
+        # One untimed query first: lazy imports and client setup would otherwise show up as loop lag.
+        await run_level(source_ids, chunks, 1, 1, args.top_k)
+
+        levels = []
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            n = max(args.queries, concurrency)
+            levels.append(await run_level(source_ids, chunks, n, concurrency, args.top_k))
+            print(f"  concurrency {concurrency:>4}: {levels[-1]['queries_per_s']:8.1f} q/s", file=sys.stderr)
+    return {"levels": levels}
+
+def _install_fakes(args):
+    import data_loader
+    import main
+    from fakes import FakeGenaiClient
+
+    fake = FakeGenaiClient(dim=data_loader.EMBED_DIM, embed_latency_s=args.embed_latency_ms / 1000,
+                           embed_per_text_s=0.0, llm_latency_s=args.llm_latency_ms / 1000)
+    data_loader.client = fake
+    main._llm_client = fake
+
+def measure(args) -> dict:
+    # The tree under test comes first on the path; fakes and run_suite always come from here.
+    sys.path[:0] = [args.app_root, HERE]
+    os.chdir(args.app_root)
+    _configure_env(args)
+    import warnings
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    _install_fakes(args)
+    return asyncio.run(run_load(args))
+
+def measure_baseline(args) -> dict:
+    """
+    Runs this script against a temporary worktree of --baseline-ref and returns its report.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = os.path.join(tmp, "baseline")
+        subprocess.run(["git", "worktree", "add", "--detach", worktree, args.baseline_ref], cwd=ROOT, check=True,
+                       capture_output=True)
+        try:
+            cmd = [sys.executable, os.path.abspath(__file__), "--app-root", worktree, "--json", "-",
+                   "--pages", str(args.pages), "--sessions", str(args.sessions), "--queries", str(args.queries), "--concurrency", args.concurrency,
+                   "--top-k", str(args.top_k), "--embed-latency-ms", str(args.embed_latency_ms),
+                   "--llm-latency-ms", str(args.llm_latency_ms), "--qdrant-url", args.qdrant_url]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"baseline run failed:\n{proc.stderr[-2000:]}")
+            return json.loads(proc.stdout)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=ROOT, capture_output=True)
+
+def print_report(report: dict, baseline: dict = None):
+    header = f"{'concurrency':>11}{'q/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'lag p99 ms':>12}{'lag max ms':>12}"
+    before = {level["concurrency"]: level for level in (baseline or {}).get("levels", [])}
+    print(header + (f"{'baseline q/s':>14}{'speedup':>9}" if baseline else ""))
+    for level in report["levels"]:
+        line = (f"{level['concurrency']:>11}{level['queries_per_s']:>10.1f}{level['p50_ms']:>10.0f}{level['p95_ms']:>10.0f}"
+                f"{level['p99_ms']:>10.0f}{level['loop_lag_p99_ms']:>12.1f}{level['loop_lag_max_ms']:>12.1f}")
+        old = before.get(level["concurrency"])
+        if old:
+            line += f"{old['queries_per_s']:>14.1f}{level['queries_per_s'] / old['queries_per_s']:>8.1f}x"
+        print(line)
+    if baseline:
+        print(f"\nbaseline ({baseline.get('ref')}) loop lag max: "
+              + ", ".join(f"c={c} {old['loop_lag_max_ms']:.0f} ms" for c, old in before.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,64", help="comma-separated in-flight query counts")
+    parser.add_argument("--queries", type=int, default=64, help="queries per level (at least the concurrency)")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=16, help="source ids the queries are spread over")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--baseline-ref", help="git revision to measure the same load against")
+    parser.add_argument("--app-root", default=ROOT, help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="write the report to this file ('-' for stdout, without the table)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline_ref:
+        print(f"measuring {args.baseline_ref} ...", file=sys.stderr)
+        baseline = {"ref": args.baseline_ref, **measure_baseline(args)}
+        print("measuring working tree ...", file=sys.stderr)
+
+    report = measure(args)
+    if baseline:
+        report["baseline"] = baseline
+
+    if args.json == "-":
+        print(json.dumps(report))
+        return
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
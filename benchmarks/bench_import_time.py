@@ -0,0 +1,142 @@
+"""
+Cold-start report: per-module import time of the app (`python -X importtime`) and, with
+--warmup, how long main.warmup() takes to load what imports now defer.
+
+    python benchmarks/bench_import_time.py                      # import main
+    python benchmarks/bench_import_time.py --module streamlit_app --top 30
+    python benchmarks/bench_import_time.py --json base.json      # save, then later:
+    python benchmarks/bench_import_time.py --compare base.json --budget-ms 1000
+
+Every measurement runs in a fresh interpreter and the fastest of --repeat runs is kept,
+since the first run also pays for cold filesystem caches. --budget-ms exits non-zero when
+the total import time exceeds the budget, for use as a regression check.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    env.setdefault("QDRANT_URL", ":memory:")
+    env.setdefault("WARMUP_ON_START", "0")
+    return env
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """
+    Parses `-X importtime` output into [{"module", "self_us", "cumulative_us", "depth"}].
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented two spaces per level below the importing module.
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": depth})
+    return entries
+
+def import_profile(module: str = "main", repeat: int = 3) -> dict:
+    """
+    Fastest of `repeat` fresh-interpreter imports of `module`: wall time, total import
+    time, and per-module entries.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=ROOT, env=_env(), capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        entries = parse_importtime(proc.stderr)
+        total_us = sum(e["cumulative_us"] for e in entries if e["depth"] == 0)
+        if best is None or total_us < best["total_ms"] * 1000:
+            best = {"module": module, "wall_ms": wall * 1000, "total_ms": total_us / 1000, "entries": entries}
+    return best
+
+def warmup_profile() -> dict:
+    code = "import json, time, main; start = time.perf_counter(); r = main.warmup(); " \
+           "print(json.dumps({'components': r, 'total_s': time.perf_counter() - start}))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"warm-up failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def direct_imports(entries: list[dict]) -> dict[str, int]:
+    """
+    Cumulative microseconds of each import made directly by the profiled module (depth 1),
+    which is where lazy-import regressions show up.
+    """
+    return {e["module"]: e["cumulative_us"] for e in entries if e["depth"] == 1}
+
+def app_modules() -> set[str]:
+    return {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+def print_report(profile: dict, top: int):
+    entries = profile["entries"]
+    print(f"import {profile['module']}: {profile['total_ms']:.0f} ms of imports, {profile['wall_ms']:.0f} ms interpreter wall time")
+
+    print(f"\n{'direct imports of ' + profile['module']:<44}{'cumulative ms':>14}")
+    for module, us in sorted(direct_imports(entries).items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {module:<42}{us / 1000:>14.1f}")
+
+    print(f"\n{'slowest modules (self time)':<44}{'self ms':>14}")
+    for e in sorted(entries, key=lambda e: -e["self_us"])[:top]:
+        print(f"  {e['module']:<42}{e['self_us'] / 1000:>14.1f}")
+
+    ours = app_modules()
+    print(f"\n{'app modules':<44}{'cumulative ms':>14}")
+    for e in sorted((e for e in entries if e["module"] in ours), key=lambda e: -e["cumulative_us"]):
+        print(f"  {e['module']:<42}{e['cumulative_us'] / 1000:>14.1f}")
+
+def compare(profile: dict, baseline: dict):
+    print(f"\ncompared with baseline: total {baseline['total_ms']:.0f} ms -> {profile['total_ms']:.0f} ms "
+          f"({(profile['total_ms'] - baseline['total_ms']) / baseline['total_ms'] * 100:+.1f}%)")
+    before = direct_imports(baseline["entries"])
+    after = direct_imports(profile["entries"])
+    changes = sorted(set(before) | set(after), key=lambda m: -abs(after.get(m, 0) - before.get(m, 0)))
+    for module in changes[:10]:
+        delta = (after.get(module, 0) - before.get(module, 0)) / 1000
+        if abs(delta) >= 1:
+            print(f"  {module:<42}{delta:>+12.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--warmup", action="store_true", help="also time main.warmup() in a fresh process")
+    parser.add_argument("--json", help="write the profile to this file")
+    parser.add_argument("--compare", help="baseline profile JSON written by --json")
+    parser.add_argument("--budget-ms", type=float, help="fail if total import time exceeds this")
+    args = parser.parse_args()
+
+    profile = import_profile(args.module, args.repeat)
+    print_report(profile, args.top)
+
+    if args.warmup:
+        profile["warmup"] = warmup_profile()
+        print(f"\nwarm-up: {profile['warmup']['total_s'] * 1000:.0f} ms")
+        for name, value in profile["warmup"]["components"].items():
+            print(f"  {name:<42}{value * 1000:>14.1f}" if isinstance(value, float) else f"  {name:<42}{value:>14}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(profile, json.load(f))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(profile, f, indent=2)
+
+    if args.budget_ms is not None and profile["total_ms"] > args.budget_ms:
+        print(f"\nimport time {profile['total_ms']:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
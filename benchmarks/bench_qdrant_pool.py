@@ -0,0 +1,95 @@
+"""
+Per-query latency of a fresh QdrantStorage per step vs the pooled storage layer.
+
+    python benchmarks/bench_qdrant_pool.py --url http://localhost:6333
+    python benchmarks/bench_qdrant_pool.py                       # in-memory, collection check only
+
+Both paths search the same already-loaded collection. The "fresh" path first pays the
+per-step setup the old QdrantStorage() paid on every query: against a server, a new
+QdrantClient (connection) plus the collection check (collection_exists, get_collection).
+That setup is timed on its own and is the saving; the "pooled" path reuses one client and
+skips the check, like get_storage(). Search times are shown for scale.
+
+Without --url the store is in-process (":memory:"): a second client would be a separate
+empty database, so the fresh path only re-runs the collection check on the loaded
+client. That number leaves out connection setup and is not representative of a server.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qdrant_client import QdrantClient
+import qdrant_store
+from qdrant_store import QdrantStorage
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": _percentile(samples, 50) * 1000,
+        "p95_ms": _percentile(samples, 95) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Qdrant server URL (default: in-memory, collection check only)")
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--points", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--prefer-grpc", action="store_true")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    rnd = random.Random(0)
+    collection = f"bench_pool_{uuid.uuid4().hex[:8]}"
+    source = "bench--doc.pdf"
+    pooled_client = QdrantClient(location=args.url or ":memory:", prefer_grpc=args.prefer_grpc, timeout=30)
+    pooled = QdrantStorage(collection=collection, dim=args.dim, client=pooled_client)
+    ids = [str(uuid.uuid4()) for _ in range(args.points)]
+    vectors = [[rnd.random() for _ in range(args.dim)] for _ in range(args.points)]
+    pooled.upsert(ids, vectors, [{"source": source, "text": f"chunk {i}"} for i in range(args.points)])
+    queries = [[rnd.random() for _ in range(args.dim)] for _ in range(args.queries)]
+    # Load and warm the collection before timing either path.
+    pooled.search(queries[0], top_k=5, source_filter=source)
+
+    setup_times, fresh_times = [], []
+    for q in queries:
+        start = time.perf_counter()
+        client = QdrantClient(location=args.url, prefer_grpc=args.prefer_grpc, timeout=30) if args.url else pooled_client
+        # The old code had no process-wide check cache, so every step re-checked the collection.
+        qdrant_store._ready_collections.clear()
+        store = QdrantStorage(collection=collection, dim=args.dim, client=client)
+        setup_times.append(time.perf_counter() - start)
+        store.search(q, top_k=5, source_filter=source)
+        fresh_times.append(time.perf_counter() - start)
+        if client is not pooled_client:
+            client.close()
+
+    pooled_times = []
+    for q in queries:
+        start = time.perf_counter()
+        pooled.search(q, top_k=5, source_filter=source)
+        pooled_times.append(time.perf_counter() - start)
+
+    pooled_client.delete_collection(collection)
+    pooled_client.close()
+
+    setup, fresh, shared = _summary(setup_times), _summary(fresh_times), _summary(pooled_times)
+    print(f"backend: {args.url or ':memory: (collection check only)'}  points: {args.points}  queries: {args.queries}  dim: {args.dim}")
+    print(f"{'path':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, s in (("setup", setup), ("fresh", fresh), ("pooled", shared)):
+        print(f"{name:<10}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}")
+    print(f"saved per query: {setup['mean_ms']:.2f} ms (mean per-step setup)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Filtered query and cleanup-delete latency vs number of active sources.
+
+    python benchmarks/bench_source_scaling.py --url http://localhost:6333
+    python benchmarks/bench_source_scaling.py --layouts shared,sharded --sources 10,100,1000
+
+Each source gets --chunks points, mimicking one uploaded PDF per session. For every
+source count the script measures search(source_filter=...) and delete_by_source latency
+for each layout. Payload indexes only exist on a Qdrant server; in local mode every
+filter is a scan, so use --url for numbers that reflect production.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qdrant_client import QdrantClient
+from vector_db import StorageProfile
+from qdrant_store import QdrantStorage
+
+def _p(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[int(pct / 100 * (len(ordered) - 1))] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--chunks", type=int, default=50, help="points per source")
+    parser.add_argument("--sources", default="10,100,500")
+    parser.add_argument("--layouts", default="shared,sharded")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.url == ":memory:":
+        warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+        print("note: local mode has no payload indexes; filters are scans")
+
+    rng = np.random.default_rng(0)
+    client = QdrantClient(location=args.url, timeout=60)
+    profile = StorageProfile(name=f"bench-{args.dim}", dim=args.dim)
+
+    print(f"backend: {args.url}  chunks/source: {args.chunks}  dim: {args.dim}")
+    print(f"{'layout':<9}{'sources':>9}{'points':>9}{'search p50':>12}{'search p95':>12}{'delete p50':>12}")
+
+    for layout in args.layouts.split(","):
+        for n_sources in (int(n) for n in args.sources.split(",")):
+            base = f"bench_scale_{uuid.uuid4().hex[:6]}"
+            store = QdrantStorage(collection=base, client=client, profile=profile, layout=layout, shards=args.shards)
+            sources = [f"{uuid.uuid4()}--doc{i}.pdf" for i in range(n_sources)]
+
+            for source in sources:
+                vecs = rng.normal(size=(args.chunks, args.dim)).astype(np.float32).tolist()
+                ids = [str(uuid.uuid4()) for _ in range(args.chunks)]
+                store.upsert(ids, vecs, [{"source": source, "text": f"chunk {i}"} for i in range(args.chunks)])
+
+            search_times = []
+            for _ in range(args.queries):
+                source = sources[rng.integers(0, n_sources)]
+                q = rng.normal(size=args.dim).astype(np.float32).tolist()
+                start = time.perf_counter()
+                store.search(q, top_k=5, source_filter=source)
+                search_times.append(time.perf_counter() - start)
+
+            delete_times = []
+            for source in sources[:min(20, n_sources)]:
+                start = time.perf_counter()
+                store.delete_by_source(source)
+                delete_times.append(time.perf_counter() - start)
+
+            for name in store.collections:
+                client.delete_collection(name)
+
+            print(f"{layout:<9}{n_sources:>9}{n_sources * args.chunks:>9}"
+                  f"{_p(search_times, 50):>10.2f}ms{_p(search_times, 95):>10.2f}ms{statistics.median(delete_times) * 1000:>10.2f}ms")
+
+if __name__ == "__main__":
+    main()
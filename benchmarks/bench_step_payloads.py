@@ -0,0 +1,68 @@
+"""
+Size and replay cost of the load_and_chunk step output: the chunk list inlined in Inngest
+state (RAGChunkAndSrc, as before the artifact store) vs an artifact handle.
+
+    python benchmarks/bench_step_payloads.py --pages 10,100,1000
+
+Inngest stores every step output and sends all of them back with each later step request,
+where the SDK deserializes them again ("replay"). For the batch ingest that is two replays
+of load_and_chunk (the embed_and_upsert request and the final one). The handle variant
+additionally pays one artifact write and one read.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import make_pdf
+from pdf_parsing import parse_page_range
+from artifact_store import ArtifactStore
+from custom_types import RAGChunkAndSrc, RAGArtifactHandle
+
+REPLAYS = 2
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6}{'chunks':>8}{'inline bytes':>14}{'handle bytes':>14}{'inline ms':>11}{'handle ms':>11}"
+          f"{'artifact w/r ms':>17}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(root=os.path.join(tmp, "artifacts"))
+        for pages in (int(p) for p in args.pages.split(",")):
+            pdf_path = os.path.join(tmp, f"bench-{pages}p.pdf")
+            make_pdf(pdf_path, pages)
+            chunks, metas = parse_page_range(pdf_path, 0, pages)
+
+            inline = RAGChunkAndSrc(chunks=chunks, source_id="doc", metas=metas)
+            inline_json = inline.model_dump_json()
+            handle = store.put_chunks(chunks, metas, source_id="doc")
+            handle_json = handle.model_dump_json()
+
+            # Serialize once when the step returns, deserialize on every replay.
+            inline_s = _best_of(lambda: [inline.model_dump_json()] + [RAGChunkAndSrc.model_validate_json(inline_json)
+                                                                      for _ in range(REPLAYS)], args.repeat)
+            handle_s = _best_of(lambda: [handle.model_dump_json()] + [RAGArtifactHandle.model_validate_json(handle_json)
+                                                                      for _ in range(REPLAYS)], args.repeat)
+            artifact_s = _best_of(lambda: store.get_chunks(store.put_chunks(chunks, metas, source_id="doc")), args.repeat)
+
+            print(f"{pages:>6}{len(chunks):>8}{len(inline_json.encode()):>14}{len(handle_json.encode()):>14}"
+                  f"{inline_s * 1000:>11.2f}{handle_s * 1000:>11.3f}{artifact_s * 1000:>17.2f}")
+
+if __name__ == "__main__":
+    main()
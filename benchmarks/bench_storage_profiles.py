@@ -0,0 +1,112 @@
+"""
+Recall vs memory vs latency report for the storage profiles in vector_db.STORAGE_PROFILES.
+
+    python benchmarks/bench_storage_profiles.py --url http://localhost:6333
+    python benchmarks/bench_storage_profiles.py --vectors chunks.npy --query-vectors questions.npy
+
+Ground truth is exact cosine top-k over the full 3072-dim vectors. Reduced-dimension
+profiles truncate the same vectors (Matryoshka), so use real gemini-embedding-001 vectors
+(--vectors/--query-vectors, saved with np.save) for decisions; the synthetic default only
+front-loads variance to imitate them. Qdrant's local/in-memory mode ignores quantization
+settings, so quantized profiles only show their real recall and latency against a server.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qdrant_client import QdrantClient
+from vector_db import STORAGE_PROFILES, StorageProfile
+from qdrant_store import QdrantStorage
+
+FULL_DIM = 3072
+
+def _synthetic(n: int, rng: np.random.Generator, centers: np.ndarray) -> np.ndarray:
+    # Variance decays along the dimensions, like Matryoshka embeddings that front-load information.
+    scale = 1.0 / np.sqrt(1.0 + np.arange(FULL_DIM) / 64.0)
+    assignment = rng.integers(0, len(centers), size=n)
+    return (centers[assignment] + rng.normal(0, 0.6, size=(n, FULL_DIM)) * scale).astype(np.float32)
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def memory_per_vector(profile: StorageProfile) -> tuple[float, float]:
+    """
+    Returns (RAM bytes, disk bytes) per stored vector, ignoring HNSW graph and payload.
+    """
+    original = profile.dim * 4
+    if profile.quantization == "int8":
+        ram = profile.dim
+    elif profile.quantization == "binary":
+        ram = profile.dim / 8
+    else:
+        ram = 0 if profile.on_disk else original
+    return ram, original if profile.on_disk else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:")
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--vectors", help=".npy file of (n, 3072) chunk embeddings")
+    parser.add_argument("--query-vectors", dest="query_vectors", help=".npy file of (m, 3072) question embeddings")
+    parser.add_argument("--profiles", default=",".join(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        data = np.load(args.vectors).astype(np.float32)
+        queries = np.load(args.query_vectors).astype(np.float32) if args.query_vectors else data[rng.choice(len(data), args.queries)]
+    else:
+        centers = rng.normal(0, 1, size=(50, FULL_DIM)).astype(np.float32)
+        data = _synthetic(args.points, rng, centers)
+        queries = _synthetic(args.queries, rng, centers)
+
+    truth = np.argsort(-(_normalize(queries) @ _normalize(data).T), axis=1)[:, :args.top_k]
+
+    client = QdrantClient(location=args.url, timeout=60)
+    source = "bench--profiles.pdf"
+    ids = [str(uuid.uuid4()) for _ in range(len(data))]
+    index_of = {pid: i for i, pid in enumerate(ids)}
+
+    print(f"backend: {args.url}  points: {len(data)}  queries: {len(queries)}  top_k: {args.top_k}")
+    if args.url == ":memory:":
+        print("note: local mode ignores quantization; quantized rows show dimensionality effects only")
+        warnings.filterwarnings("ignore", message="Local mode performs exact")
+    print(f"{'profile':<14}{'dim':>6}{'recall@k':>10}{'RAM/vec':>10}{'disk/vec':>10}{'RAM/100k':>11}{'p50 ms':>9}{'p95 ms':>9}")
+
+    for name in args.profiles.split(","):
+        profile = STORAGE_PROFILES[name]
+        collection = f"bench_profile_{name}_{uuid.uuid4().hex[:6]}"
+        store = QdrantStorage(collection=collection, client=client, profile=profile)
+
+        vecs = data[:, :profile.dim]
+        payloads = [{"source": source, "text": pid} for pid in ids]
+        for i in range(0, len(ids), 256):
+            store.upsert(ids[i:i + 256], vecs[i:i + 256].tolist(), payloads[i:i + 256])
+
+        hits, latencies = 0, []
+        for qi, q in enumerate(queries[:, :profile.dim]):
+            start = time.perf_counter()
+            found = store.search(q.tolist(), top_k=args.top_k, source_filter=source)
+            latencies.append(time.perf_counter() - start)
+            hits += len({index_of[t] for t in found["contexts"]} & set(truth[qi].tolist()))
+
+        client.delete_collection(collection)
+
+        recall = hits / (len(queries) * args.top_k)
+        ram, disk = memory_per_vector(profile)
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] * 1000
+        print(f"{name:<14}{profile.dim:>6}{recall:>10.3f}{ram:>9.0f}B{disk:>9.0f}B{ram * 100_000 / 2**20:>8.1f}MiB{p50:>9.2f}{p95:>9.2f}")
+
+if __name__ == "__main__":
+    main()
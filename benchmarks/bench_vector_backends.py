@@ -0,0 +1,84 @@
+"""
+Per-query latency of the in-process NumPy backend vs Qdrant across chunk counts.
+
+    python benchmarks/bench_vector_backends.py --url http://localhost:6333
+    python benchmarks/bench_vector_backends.py --chunks 50,200,1000,5000 --background-sources 100
+
+Every query is filtered to one source (one uploaded PDF) of --chunks points. The Qdrant
+collection additionally holds --background-sources other sources, like the shared `docs`
+collection does in production; the NumPy backend keeps them in separate matrices, so they
+don't affect it. Against :memory: Qdrant runs in-process too, so only a server shows the
+network round trip the NumPy backend removes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qdrant_client import QdrantClient
+from vector_db import StorageProfile
+from qdrant_store import QdrantStorage
+from numpy_store import NumpyVectorStore
+
+def _fill(store, rng, source: str, n: int, dim: int):
+    for start in range(0, n, 256):
+        size = min(256, n - start)
+        vecs = rng.normal(size=(size, dim)).astype(np.float32).tolist()
+        ids = [str(uuid.uuid4()) for _ in range(size)]
+        store.upsert(ids, vecs, [{"source": source, "text": f"chunk {start + i}"} for i in range(size)])
+
+def _time_queries(store, queries, source: str, top_k: int) -> tuple[float, float]:
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        store.search(q, top_k=top_k, source_filter=source)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(0.95 * (len(samples) - 1))] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:")
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--chunks", default="50,200,1000,5000")
+    parser.add_argument("--background-sources", type=int, default=20)
+    parser.add_argument("--background-chunks", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    rng = np.random.default_rng(0)
+    client = QdrantClient(location=args.url, timeout=60)
+    profile = StorageProfile(name=f"bench-{args.dim}", dim=args.dim)
+
+    print(f"qdrant: {args.url}  dim: {args.dim}  background: {args.background_sources}x{args.background_chunks}")
+    print(f"{'chunks':>8}{'numpy p50':>12}{'numpy p95':>12}{'qdrant p50':>12}{'qdrant p95':>12}  faster")
+
+    for n in (int(c) for c in args.chunks.split(",")):
+        collection = f"bench_backends_{uuid.uuid4().hex[:6]}"
+        qdrant = QdrantStorage(collection=collection, client=client, profile=profile, layout="shared")
+        numpy_store = NumpyVectorStore(dim=args.dim)
+        source = f"{uuid.uuid4()}--target.pdf"
+
+        for store in (qdrant, numpy_store):
+            _fill(store, np.random.default_rng(n), source, n, args.dim)
+            for b in range(args.background_sources):
+                _fill(store, np.random.default_rng(b), f"background-{b}", args.background_chunks, args.dim)
+
+        queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32).tolist()
+        np_p50, np_p95 = _time_queries(numpy_store, queries, source, args.top_k)
+        qd_p50, qd_p95 = _time_queries(qdrant, queries, source, args.top_k)
+        client.delete_collection(collection)
+
+        faster = "numpy" if np_p50 < qd_p50 else "qdrant"
+        print(f"{n:>8}{np_p50:>10.3f}ms{np_p95:>10.3f}ms{qd_p50:>10.3f}ms{qd_p95:>10.3f}ms  {faster}")
+
+if __name__ == "__main__":
+    main()
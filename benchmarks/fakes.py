@@ -0,0 +1,170 @@
+"""
+Local stand-ins for Gemini and Inngest used by the offline benchmarks: a deterministic
+embedder and LLM with configurable latency, a minimal Inngest context that runs steps
+inline, and a generator for text PDFs of any page count.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import random
+import time
+import types
+import uuid
+import numpy as np
+import pydantic
+
+# --- Fake genai client ---
+class _FakeModels:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self._owner.llm_latency_s)
+        return types.SimpleNamespace(text=self._owner.answer_for(contents))
+
+    def embed_content(self, model, contents, config=None):
+        time.sleep(self._owner.embed_delay(len(contents)))
+        return self._owner.embed_response(contents, config)
+
+class _FakeAsyncModels:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    async def embed_content(self, model, contents, config=None):
+        await asyncio.sleep(self._owner.embed_delay(len(contents)))
+        return self._owner.embed_response(contents, config)
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self._owner.llm_latency_s)
+        return types.SimpleNamespace(text=self._owner.answer_for(contents))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        owner = self._owner
+        words = owner.answer_for(contents).split(" ")
+
+        async def _chunks():
+            # First token after the prefill latency, then a steady decode rate.
+            await asyncio.sleep(owner.llm_latency_s * 0.3)
+            for i in range(0, len(words), 4):
+                await asyncio.sleep(owner.llm_latency_s * 0.7 * 4 / max(len(words), 1))
+                yield types.SimpleNamespace(text=" ".join(words[i:i + 4]) + " ")
+
+        return _chunks()
+
+class FakeGenaiClient:
+    """
+    Drop-in for genai.Client covering what the pipeline calls. Embeddings are seeded by a
+    hash of the text, so the same text always gets the same unit vector.
+    """
+
+    def __init__(self, dim: int = 3072, embed_latency_s: float = 0.05, embed_per_text_s: float = 0.0005,
+                 llm_latency_s: float = 0.5):
+        self.dim = dim
+        self.embed_latency_s = embed_latency_s
+        self.embed_per_text_s = embed_per_text_s
+        self.llm_latency_s = llm_latency_s
+        self.embed_calls = 0
+        self.llm_calls = 0
+        self.models = _FakeModels(self)
+        self.aio = types.SimpleNamespace(models=_FakeAsyncModels(self))
+
+    def embed_delay(self, n: int) -> float:
+        self.embed_calls += 1
+        return self.embed_latency_s + self.embed_per_text_s * n
+
+    def embed_response(self, contents, config=None):
+        dim = (config or {}).get("output_dimensionality", self.dim)
+        return types.SimpleNamespace(embeddings=[types.SimpleNamespace(values=fake_vector(t, dim)) for t in contents])
+
+    def answer_for(self, prompt: str) -> str:
+        self.llm_calls += 1
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "little")
+        rnd = random.Random(seed)
+        return " ".join(rnd.choice(_VOCAB) for _ in range(120)) + "."
+
+def fake_vector(text: str, dim: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+# --- Fake Inngest context ---
+class _FakeStep:
+    def __init__(self):
+        self.payload_bytes: dict[str, int] = {}
+        self.timings: dict[str, float] = {}
+
+    async def run(self, step_id, handler, *handler_args, output_type=None):
+        start = time.perf_counter()
+        output = handler(*handler_args)
+        if inspect.isawaitable(output):
+            output = await output
+
+        # Round-trip through JSON like Inngest does, so payload size and (de)serialization are measured.
+        if isinstance(output, pydantic.BaseModel):
+            encoded = output.model_dump_json()
+            output = type(output).model_validate_json(encoded)
+        else:
+            encoded = json.dumps(output)
+            output = json.loads(encoded)
+
+        self.payload_bytes[step_id] = len(encoded.encode("utf-8"))
+        self.timings[step_id] = time.perf_counter() - start
+        return output
+
+    async def sleep(self, step_id, duration):
+        self.timings[step_id] = 0.0
+
+class FakeContext:
+    def __init__(self, data: dict):
+        self.event = types.SimpleNamespace(data=data, id=str(uuid.uuid4()), name="benchmark")
+        self.step = _FakeStep()
+
+def function_body(fn):
+    """
+    The coroutine function behind an @inngest_client.create_function object.
+    """
+    return getattr(fn, "_handler", fn)
+
+# --- PDF generation ---
+_VOCAB = (
+    "the contract revenue clause party agreement payment term notice liability quarter report "
+    "growth margin customer product market risk audit policy section schedule obligation "
+    "delivery warranty period annual total increase decrease compared previous fiscal"
+).split()
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 45, words_per_line: int = 12, seed: int = 0):
+    """
+    Writes a text PDF with `pages` pages of pseudo-random sentences (Helvetica, no images).
+    """
+    rnd = random.Random(seed)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            words = [rnd.choice(_VOCAB) for _ in range(words_per_line)]
+            lines.append(_escape(" ".join(words).capitalize() + "."))
+        stream = "BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(out)
@@ -0,0 +1,279 @@
+"""
+Offline end-to-end benchmark for ingest and query. No Gemini, Qdrant server or Inngest needed.
+
+    python benchmarks/run_suite.py                         # 1, 10 and 100 page PDFs
+    python benchmarks/run_suite.py --pages 1,10,100,1000 --queries 200
+    python benchmarks/run_suite.py --compare benchmarks/results/<older>.json
+    python benchmarks/run_suite.py --embed-provider hashing   # CPU-local embeddings, no fake latency
+
+Gemini is replaced by a deterministic fake embedder and LLM with configurable latency,
+Qdrant by QdrantClient(":memory:") (or --qdrant-url), and Inngest by a context that runs
+steps inline and round-trips their outputs through JSON. For each generated PDF the suite
+times the individual stages (load_and_chunk_pdf, embed_texts, upsert, search), then the
+rag_ingest_pdf and rag_query_pdf_ai function bodies, and reports ingest throughput, query
+p50/p95/p99 and peak RSS. Results are written as JSON to benchmarks/results/.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def _configure_env(args):
+    # Must run before the pipeline modules are imported: they read configuration at import time.
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ["QDRANT_URL"] = args.qdrant_url
+    os.environ["QDRANT_COLLECTION"] = f"bench_suite_{uuid.uuid4().hex[:8]}"
+    os.environ["EMBED_PROVIDER"] = args.embed_provider
+    os.environ["EMBED_CACHE"] = "1" if args.embed_cache else "0"
+    os.environ["EMBED_CACHE_PATH"] = os.path.join(tempfile.gettempdir(), f"rag-bench-{uuid.uuid4().hex[:8]}.sqlite3")
+    os.environ["ANSWER_CACHE"] = "0"
+    # A fresh registry, or identical generated PDFs from an earlier run would be deduplicated away.
+    os.environ["DOC_REGISTRY_PATH"] = os.path.join(tempfile.gettempdir(), f"rag-bench-docs-{uuid.uuid4().hex[:8]}.sqlite3")
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def latency_summary(samples: list[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": (sum(samples) / len(samples) * 1000) if samples else 0.0,
+    }
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def bench_stages(pdf_path: str, pages: int, n_searches: int) -> dict:
+    from data_loader import load_and_chunk_pdf, embed_texts
+    from vector_db import get_storage
+    from streaming_ingest import chunk_point_id
+
+    start = time.perf_counter()
+    chunks = load_and_chunk_pdf(pdf_path)
+    parse_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = embed_texts(chunks)
+    embed_s = time.perf_counter() - start
+
+    source_id = f"stages-{uuid.uuid4()}"
+    store = get_storage()
+    start = time.perf_counter()
+    store.upsert([chunk_point_id(source_id, i) for i in range(len(chunks))], vectors,
+                 [{"source": source_id, "text": t, "chunk_index": i} for i, t in enumerate(chunks)])
+    upsert_s = time.perf_counter() - start
+
+    searches = []
+    for i in range(n_searches):
+        q = vectors[i % len(vectors)]
+        start = time.perf_counter()
+        store.search(q, top_k=5, source_filter=source_id)
+        searches.append(time.perf_counter() - start)
+    store.delete_by_source(source_id)
+
+    return {
+        "chunks": len(chunks),
+        "load_and_chunk_s": parse_s,
+        "embed_s": embed_s,
+        "upsert_s": upsert_s,
+        "parse_pages_per_s": pages / parse_s if parse_s else 0.0,
+        "embed_chunks_per_s": len(chunks) / embed_s if embed_s else 0.0,
+        "upsert_chunks_per_s": len(chunks) / upsert_s if upsert_s else 0.0,
+        "search": latency_summary(searches),
+    }
+
+async def bench_ingest(pdf_path: str, pages: int, mode: str) -> tuple[dict, str, list[str]]:
+    import main
+    from data_loader import load_and_chunk_pdf
+    from fakes import FakeContext, function_body
+
+    source_id = f"{uuid.uuid4()}--bench.pdf"
+    ctx = FakeContext({"pdf_path": pdf_path, "source_id": source_id, "mode": mode})
+    start = time.perf_counter()
+    result = await function_body(main.rag_ingest_pdf)(ctx)
+    elapsed = time.perf_counter() - start
+
+    chunks = result["ingested_count"]
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "chunks": chunks,
+        "pages_per_s": pages / elapsed,
+        "chunks_per_s": chunks / elapsed,
+        "step_seconds": ctx.step.timings,
+        "step_payload_bytes": ctx.step.payload_bytes,
+    }, source_id, load_and_chunk_pdf(pdf_path)
+
+async def bench_queries(source_id: str, chunks: list[str], n: int, concurrency: int, top_k: int) -> dict:
+    import main
+    from fakes import FakeContext, function_body
+
+    handler = function_body(main.rag_query_pdf_ai)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def _one(i: int):
+        # Questions quote a sentence from the document, so every query retrieves real context.
+        sentence = chunks[(i * 7) % len(chunks)].split(".")[0]
+        ctx = FakeContext({"question": f"Q{i}: what does it say about {sentence}?", "top_k": top_k, "source_id": source_id})
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(ctx)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(n)))
+    wall = time.perf_counter() - start
+    return {**latency_summary(latencies), "concurrency": concurrency, "queries_per_s": n / wall}
+
+async def bench_batch_query(source_id: str, chunks: list[str], n: int, top_k: int) -> dict:
+    """
+    The same n questions as bench_queries, answered by one rag/query_pdf_batch run.
+    """
+    import main
+    from fakes import FakeContext, function_body
+
+    questions = [f"Batch Q{i}: what does it say about {chunks[(i * 7) % len(chunks)].split('.')[0]}?" for i in range(n)]
+    ctx = FakeContext({"questions": questions, "top_k": top_k, "source_id": source_id})
+    start = time.perf_counter()
+    result = await function_body(main.rag_query_pdf_batch)(ctx)
+    wall = time.perf_counter() - start
+    return {"questions": n, "seconds": wall, "queries_per_s": n / wall, "timing": result["timing"]}
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = {r["pages"]: r for r in baseline["results"]}
+
+    print(f"\ncompared with {baseline_path} (commit {baseline.get('commit')})")
+    if "import_ms" in baseline and "import_ms" in current:
+        before, after = baseline["import_ms"], current["import_ms"]
+        print(f"  {'import main ms':<18}{before:>12.2f} -> {after:>12.2f}  ({(after - before) / before * 100:+.1f}%)")
+    metrics = [
+        ("ingest pages/s", lambda r: r["ingest"]["pages_per_s"]),
+        ("ingest chunks/s", lambda r: r["ingest"]["chunks_per_s"]),
+        ("query p50 ms", lambda r: r["query"]["p50_ms"]),
+        ("query p95 ms", lambda r: r["query"]["p95_ms"]),
+        ("query p99 ms", lambda r: r["query"]["p99_ms"]),
+        ("batch query/s", lambda r: r["query_batch"]["queries_per_s"]),
+        ("peak RSS MB", lambda r: r["peak_rss_mb"]),
+    ]
+    for r in current["results"]:
+        if r["pages"] not in old:
+            continue
+        print(f"  {r['pages']} pages")
+        for name, get in metrics:
+            try:
+                before, after = get(old[r["pages"]]), get(r)
+            except KeyError:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"    {name:<16}{before:>12.2f} -> {after:>12.2f}  ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="1,10,100", help="comma-separated PDF sizes (1-1000 pages)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--ingest-mode", default="stream", choices=["stream", "batch"])
+    parser.add_argument("--embed-provider", default="gemini", choices=["gemini", "hashing"],
+                        help="gemini uses the fake client; hashing embeds for real on the CPU")
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0, help="fixed latency per embed request")
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.5, help="extra latency per embedded text")
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--embed-cache", action="store_true", help="keep the on-disk embedding cache enabled")
+    parser.add_argument("--out", help="output JSON path (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    _configure_env(args)
+    import warnings
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+
+    import data_loader
+    import main as app_main
+    from fakes import FakeGenaiClient, make_pdf
+
+    fake = FakeGenaiClient(
+        dim=data_loader.EMBED_DIM,
+        embed_latency_s=args.embed_latency_ms / 1000,
+        embed_per_text_s=args.embed_per_text_ms / 1000,
+        llm_latency_s=args.llm_latency_ms / 1000,
+    )
+    data_loader.client = fake
+    app_main._llm_client = fake
+
+    from bench_import_time import import_profile
+    startup = import_profile("main")
+    print(f"import main {startup['total_ms']:7.1f} ms  (see benchmarks/bench_import_time.py for the per-module report)")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "import_ms": startup["total_ms"],
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in (int(p) for p in args.pages.split(",")):
+            pdf_path = os.path.join(tmp, f"bench-{pages}p.pdf")
+            make_pdf(pdf_path, pages)
+
+            stages = bench_stages(pdf_path, pages, n_searches=args.queries)
+            ingest, source_id, chunks = asyncio.run(bench_ingest(pdf_path, pages, args.ingest_mode))
+            query = asyncio.run(bench_queries(source_id, chunks, args.queries, args.concurrency, args.top_k))
+            query_batch = asyncio.run(bench_batch_query(source_id, chunks, args.queries, args.top_k))
+
+            result = {"pages": pages, "stages": stages, "ingest": ingest, "query": query, "query_batch": query_batch,
+                      "embed_batch_size": data_loader.embed_batch_size(), "peak_rss_mb": peak_rss_mb()}
+            report["results"].append(result)
+            print(f"{pages:>5} pages  {ingest['chunks']:>6} chunks  ingest {ingest['pages_per_s']:8.1f} pages/s "
+                  f"{ingest['chunks_per_s']:8.1f} chunks/s  query p50 {query['p50_ms']:7.1f} ms  "
+                  f"p95 {query['p95_ms']:7.1f} ms  p99 {query['p99_ms']:7.1f} ms  batch {query_batch['queries_per_s']:7.1f} q/s  "
+                  f"embed batch {result['embed_batch_size']:>4}  RSS {result['peak_rss_mb']:7.1f} MB")
+
+    out = args.out or os.path.join(
+        ROOT, "benchmarks", "results", f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import re
+
+# Cheap stand-in for the cl100k tokenizer SentenceSplitter counts with: ASCII words count
+# one token per 10 letters, digits one per 3, punctuation one per 2 characters, a newline
+# run or an indent one each, and any other character (accents, CJK) one token. It runs
+# entirely inside the regex engine and overestimates English text by roughly 5%, so
+# chunks stay within budget.
+_TOKEN_PIECE = re.compile(r"[A-Za-z]{1,10}|\d{1,3}|\n+|[ \t]{2,}|[!-/:-@\[-`{-~]{1,2}|\S")
+
+# A sentence ends at terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace; the next sentence starts at the following non-space character. The word in
+# front of the punctuation and the next character decide about abbreviations.
+_SENTENCE_END = re.compile(r"([.!?]+)[\"'”’)\]]*\s+(?=(\S))")
+_WORD_BEFORE = re.compile(r"\w*\Z")
+_ABBREVIATIONS = {
+    "al", "approx", "cf", "co", "corp", "dept", "dr", "eg", "etc", "fig", "figs", "ie", "inc", "jr",
+    "ltd", "mr", "mrs", "ms", "no", "nos", "pp", "prof", "sec", "sr", "st", "vol", "vs",
+}
+# Same secondary split as SentenceSplitter: clauses ending in , . ; (or CJK punctuation).
+_CLAUSE = re.compile(r"[^,.;。？！]+[,.;。？！]?|[,.;。？！]")
+
+def estimate_tokens(text: str, start: int = 0, end: int = None) -> int:
+    return len(_TOKEN_PIECE.findall(text, start, len(text) if end is None else end))
+
+def sentence_starts(text: str, start: int, end: int) -> list[int]:
+    """
+    Offsets in (start, end) where a new sentence begins, found in a single regex pass.
+    """
+    starts = []
+    for m in _SENTENCE_END.finditer(text, start, end):
+        punct, following = m.group(1), m.group(2)
+        if following.islower():
+            continue
+        if punct == ".":
+            # Abbreviations and initials ("Dr.", "e.g.", "J. Smith") don't end a sentence.
+            word = _WORD_BEFORE.search(text, max(start, m.start() - 16), m.start()).group()
+            if word.lower() in _ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        starts.append(m.end())
+    return starts
+
+class SentenceChunker:
+    """
+    Splits text into chunks of at most chunk_size tokens with up to chunk_overlap tokens
+    carried over between neighbours, preferring paragraph and sentence boundaries. Follows
+    llama_index's SentenceSplitter (same split order and merge rules) but counts tokens
+    with estimate_tokens and works on offsets, so every chunk is an exact slice of the
+    input and no chunk text has to be searched for afterwards.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, paragraph_separator: str = "\n\n\n"):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.paragraph_separator = paragraph_separator
+
+    def split_text(self, text: str) -> list[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str) -> list[tuple[int, int]]:
+        """
+        (start, end) offsets of each chunk in text, with surrounding whitespace trimmed.
+        """
+        if not text or text.isspace():
+            return []
+        return self._merge(text, self._split(text, 0, len(text)))
+
+    def _split(self, text: str, start: int, end: int) -> list[tuple[int, int, int, bool]]:
+        # Splits are (start, end, tokens, is_sentence), each at most chunk_size tokens
+        # unless it is a single character.
+        tokens = estimate_tokens(text, start, end)
+        if tokens <= self.chunk_size:
+            return [(start, end, tokens, True)]
+
+        bounds, is_sentence = self._boundaries(text, start, end)
+        splits = []
+        for piece_start, piece_end in zip(bounds, bounds[1:]):
+            tokens = estimate_tokens(text, piece_start, piece_end)
+            if tokens <= self.chunk_size or len(bounds) == 2:
+                splits.append((piece_start, piece_end, tokens, is_sentence))
+            else:
+                splits.extend(self._split(text, piece_start, piece_end))
+        return splits
+
+    def _boundaries(self, text: str, start: int, end: int) -> tuple[list[int], bool]:
+        """
+        Piece boundaries [start, ..., end] from the first rule that splits the range:
+        paragraphs, then sentences (both count as sentences), then clauses, words and
+        finally single characters.
+        """
+        # The separator stays at the front of the piece that follows it.
+        inner = []
+        at = text.find(self.paragraph_separator, start + 1, end)
+        while at >= 0:
+            inner.append(at)
+            at = text.find(self.paragraph_separator, at + len(self.paragraph_separator), end)
+        if inner:
+            return [start, *inner, end], True
+
+        inner = sentence_starts(text, start, end)
+        if inner:
+            return [start, *inner, end], True
+
+        inner = [m.end() for m in _CLAUSE.finditer(text, start, end)][:-1]
+        if inner:
+            return [start, *inner, end], False
+
+        inner = []
+        at = text.find(" ", start + 1, end)
+        while at >= 0:
+            inner.append(at)
+            at = text.find(" ", at + 1, end)
+        if inner:
+            return [start, *inner, end], False
+
+        return list(range(start, end + 1)), False
+
+    def _merge(self, text: str, splits: list[tuple[int, int, int, bool]]) -> list[tuple[int, int]]:
+        # The chunk being built is always the contiguous run splits[lo:i], so closing a
+        # chunk and carrying its tail over as overlap only moves lo.
+        spans = []
+        lo = i = 0
+        length = 0
+        new_chunk = True
+
+        def close():
+            nonlocal lo, length, new_chunk
+            first = lo
+            spans.append((splits[first][0], splits[i - 1][1]))
+            # Carry as many trailing splits of the closed chunk as fit in chunk_overlap.
+            lo, length = i, 0
+            while lo > first and length + splits[lo - 1][2] <= self.chunk_overlap:
+                lo -= 1
+                length += splits[lo][2]
+            new_chunk = True
+
+        while i < len(splits):
+            tokens, is_sentence = splits[i][2], splits[i][3]
+            if length + tokens > self.chunk_size and not new_chunk:
+                close()
+                continue
+            if new_chunk:
+                # Drop overlap from the front until the next split fits.
+                while lo < i and length + tokens > self.chunk_size:
+                    length -= splits[lo][2]
+                    lo += 1
+            if is_sentence or length + tokens <= self.chunk_size or new_chunk:
+                length += tokens
+                i += 1
+                new_chunk = False
+            else:
+                close()
+        if not new_chunk:
+            spans.append((splits[lo][0], splits[i - 1][1]))
+
+        trimmed = []
+        for start, end in spans:
+            chunk = text[start:end]
+            stripped = chunk.strip()
+            if stripped:
+                start += len(chunk) - len(chunk.lstrip())
+                trimmed.append((start, start + len(stripped)))
+        return trimmed
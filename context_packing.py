@@ -0,0 +1,84 @@
+import os
+import re
+from chunking import estimate_tokens
+from custom_types import RAGPackedContext
+
+# --- Context assembly configuration ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+CONTEXT_DEDUP_JACCARD = float(os.getenv("CONTEXT_DEDUP_JACCARD", "0.8"))
+
+_WORD = re.compile(r"\w+")
+
+def _shingles(text: str, n: int = 5) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def _merge_spans(hits: list[dict]) -> list[dict]:
+    """
+    Merges hits from the same source and page whose character ranges overlap or touch,
+    rebuilding the span text without the repeated overlap. Each span keeps the best
+    (lowest) rank of the hits it absorbed.
+    """
+    spans = []
+    located = {}
+    for rank, hit in enumerate(hits):
+        span = {"text": hit.get("text", ""), "rank": rank, "source": hit.get("source", ""),
+                "page": hit.get("page"), "start": hit.get("char_start", -1), "end": hit.get("char_end", -1)}
+        if span["page"] is None or span["start"] < 0:
+            spans.append(span)
+        else:
+            located.setdefault((span["source"], span["page"]), []).append(span)
+
+    for group in located.values():
+        group.sort(key=lambda s: s["start"])
+        current = group[0]
+        for nxt in group[1:]:
+            if nxt["start"] <= current["end"]:
+                if nxt["end"] > current["end"]:
+                    current["text"] += nxt["text"][current["end"] - nxt["start"]:]
+                    current["end"] = nxt["end"]
+                current["rank"] = min(current["rank"], nxt["rank"])
+            else:
+                spans.append(current)
+                current = nxt
+        spans.append(current)
+
+    return spans
+
+def pack_context(hits: list[dict], token_budget: int = None, dedup_jaccard: float = None) -> RAGPackedContext:
+    """
+    Turns ranked search hits into the context passages sent to the LLM: overlapping or
+    adjacent chunks are merged back into spans, near-duplicate spans are dropped, and spans
+    are added in relevance order until the token budget is spent. Passages come back in
+    document order.
+    """
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    dedup_jaccard = CONTEXT_DEDUP_JACCARD if dedup_jaccard is None else dedup_jaccard
+    tokens_in = sum(estimate_tokens(h.get("text", "")) for h in hits)
+
+    kept = []
+    kept_shingles = []
+    used = 0
+    for span in sorted(_merge_spans(hits), key=lambda s: s["rank"]):
+        shingles = _shingles(span["text"])
+        if any(len(shingles & other) / len(shingles | other) >= dedup_jaccard for other in kept_shingles):
+            continue
+
+        tokens = estimate_tokens(span["text"])
+        if used + tokens > token_budget:
+            remaining = token_budget - used
+            # Always send something for the best span; otherwise skip what doesn't fit.
+            if kept or remaining <= 0:
+                continue
+            span["text"] = span["text"][:remaining * 4]
+            tokens = estimate_tokens(span["text"])
+
+        kept.append(span)
+        kept_shingles.append(shingles)
+        used += tokens
+
+    kept.sort(key=lambda s: (s["source"], s["page"] if s["page"] is not None else -1, s["start"], s["rank"]))
+    contexts = [s["text"] for s in kept]
+    return RAGPackedContext(contexts=contexts, tokens_in=tokens_in, tokens_out=used, tokens_saved=tokens_in - used)
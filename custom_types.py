@@ -1,17 +1,83 @@
 import pydantic
 
+class RAGChunkMeta(pydantic.BaseModel):
+    page: int
+    start: int
+    end: int
+
 class RAGChunkAndSrc(pydantic.BaseModel):
     chunks: list[str]
     source_id: str = None
+    metas: list[RAGChunkMeta] = []
+
+class RAGArtifactHandle(pydantic.BaseModel):
+    """
+    Reference to step data kept in the artifact store instead of Inngest's step state.
+    """
+    path: str
+    digest: str
+    count: int
+    nbytes: int
+    source_id: str = None
 
 class RAGUpsertResult(pydantic.BaseModel):
     ingested: int
+    expires_at: float | None = None
 
 class RAGSearchResult(pydantic.BaseModel):
     contexts: list[str]
     sources: list[str]
+    hits: list[dict] = []
+    # Set when the scheduler shed the query instead of running it.
+    busy: bool = False
+
+class RAGBatchSearchResult(pydantic.BaseModel):
+    results: list[RAGSearchResult]
+    seconds: float = 0.0
+    busy: bool = False
 
 class RAGQueryResult(pydantic.BaseModel):
     answer: str
     sources: list[str]
-    num_contexts: int
\ No newline at end of file
+    num_contexts: int
+
+class EmbedBatchTiming(pydantic.BaseModel):
+    index: int
+    size: int
+    attempts: int
+    seconds: float
+
+class RAGDocumentLease(pydantic.BaseModel):
+    source_id: str
+    doc_id: str
+    pdf_path: str
+    should_index: bool
+    expires_at: float
+    doc_expires_at: float
+
+class RAGDocumentLeases(pydantic.BaseModel):
+    leases: list[RAGDocumentLease]
+
+class RAGBatchUpsertResult(pydantic.BaseModel):
+    ingested: dict[str, int]
+    expires_at: float | None = None
+
+class RAGIngestProgress(pydantic.BaseModel):
+    source_id: str
+    status: str = "parsing"
+    pages_done: int = 0
+    pages_total: int = 0
+    chunks_done: int = 0
+    error: str | None = None
+
+class RAGQueryRequest(pydantic.BaseModel):
+    question: str
+    top_k: int = 5
+    # Never empty: an empty id would search every user's documents.
+    source_id: str = pydantic.Field(min_length=1)
+
+class RAGPackedContext(pydantic.BaseModel):
+    contexts: list[str]
+    tokens_in: int
+    tokens_out: int
+    tokens_saved: int
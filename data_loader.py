@@ -1,33 +1,281 @@
-from google import genai
-from llama_index.readers.file import PDFReader
-from llama_index.core.node_parser import SentenceSplitter
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
+from custom_types import EmbedBatchTiming, RAGChunkMeta
+from embed_cache import EmbeddingCache
+from embedding import BatchAutotuner, EmbeddingProvider, create_provider
+from scheduler import PriorityScheduler, SCHED_EMBED_CONCURRENCY, SCHED_EMBED_PER_SOURCE
+from pdf_parsing import chunk_page, parse_pdfs, aparse_pdfs, PDF_CHUNKER, PDF_PARSE_WORKERS
+from vector_db import active_profile
+import telemetry
 
 load_dotenv()
 
-client = genai.Client()
-EMBED_MODEL = "gemini-embedding-001"
-EMBED_DIM = 3072
+logger = logging.getLogger(__name__)
 
-splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=200)
+# Created on first use (see get_genai_client): importing google.genai and building the
+# client is a noticeable part of a worker's cold start.
+client = None
+# The provider (EMBED_PROVIDER) decides the vectors; the storage profile decides their size.
+EMBED_DIM = active_profile().dim
 
-def load_and_chunk_pdf(path: str):
-    docs = PDFReader().load_data(file=path)
-    texts = [d.text for d in docs if getattr(d, "text", None)]
-    chunks = []
+# --- Embedding batch engine configuration ---
+# Texts per request; 0 lets BatchAutotuner pick the size from observed throughput,
+# within the provider's limits.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "0"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE_S = float(os.getenv("EMBED_BACKOFF_BASE_S", "0.5"))
+EMBED_BACKOFF_MAX_S = float(os.getenv("EMBED_BACKOFF_MAX_S", "20"))
 
-    for t in texts:
-        chunks.extend(splitter.split_text(t))
+# --- Embedding cache configuration ---
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") != "0"
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
 
-    return chunks
+# Embedding requests of every caller (queries, streaming and batch ingest) share one quota.
+embed_scheduler = PriorityScheduler("embed", SCHED_EMBED_CONCURRENCY, per_source=SCHED_EMBED_PER_SOURCE)
 
-def embed_texts(texts: list[str]) -> list[list[float]]:
-    response = client.models.embed_content(
-        model=EMBED_MODEL,
-        contents=texts,
-        config={
-            "output_dimensionality": EMBED_DIM
-        },
-    )
+_embed_cache = None
+_embed_cache_lock = threading.Lock()
+_client_lock = threading.Lock()
+_provider = None
+_autotuner = None
+_provider_lock = threading.Lock()
+_embed_loop = None
+_embed_loop_lock = threading.Lock()
 
-    return [embedding.values for embedding in response.embeddings]
\ No newline at end of file
+def get_genai_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from google import genai
+                client = genai.Client()
+    return client
+
+def get_embedding_provider() -> EmbeddingProvider:
+    global _provider, _autotuner
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                provider = create_provider(dim=EMBED_DIM, get_genai_client=get_genai_client)
+                minimum, maximum, initial = provider.batch_limits
+                _autotuner = BatchAutotuner(provider.name, minimum, maximum, initial)
+                _provider = provider
+    return _provider
+
+def embed_batch_size() -> int:
+    """
+    Texts per embedding request right now: EMBED_BATCH_SIZE if set, else the autotuner's pick.
+    """
+    get_embedding_provider()
+    return EMBED_BATCH_SIZE or _autotuner.size()
+
+def load_and_chunk_pdfs(paths: list[str], page_counts: list[int] = None, chunker: str = None) -> list[tuple[list[str], list[RAGChunkMeta]]]:
+    """
+    Parses and chunks PDFs in page ranges across the parse worker pool; pages of all files
+    share the pool. Returns (chunks, metas) per path. chunker ("llama_index" or "native")
+    overrides PDF_CHUNKER.
+    """
+    page_counts = page_counts or [pdf_page_count(p) for p in paths]
+    chunker = chunker or PDF_CHUNKER
+    with telemetry.span("ingest.parse", files=len(paths), pages=sum(page_counts), workers=PDF_PARSE_WORKERS,
+                        chunker=chunker) as parse_span:
+        results = parse_pdfs(paths, page_counts, chunker)
+        parse_span.set(chunks=sum(len(chunks) for chunks, _ in results))
+    return results
+
+async def aload_and_chunk_pdfs(paths: list[str], page_counts: list[int] = None, chunker: str = None) -> list[tuple[list[str], list[RAGChunkMeta]]]:
+    """
+    load_and_chunk_pdfs without blocking the event loop: page counting runs in a thread and
+    parsing is awaited on the worker pool.
+    """
+    page_counts = page_counts or await asyncio.to_thread(lambda: [pdf_page_count(p) for p in paths])
+    chunker = chunker or PDF_CHUNKER
+    with telemetry.span("ingest.parse", files=len(paths), pages=sum(page_counts), workers=PDF_PARSE_WORKERS,
+                        chunker=chunker) as parse_span:
+        results = await aparse_pdfs(paths, page_counts, chunker)
+        parse_span.set(chunks=sum(len(chunks) for chunks, _ in results))
+    return results
+
+def load_and_chunk_pdf_with_meta(path: str, chunker: str = None) -> tuple[list[str], list[RAGChunkMeta]]:
+    return load_and_chunk_pdfs([path], chunker=chunker)[0]
+
+def load_and_chunk_pdf(path: str, chunker: str = None):
+    return load_and_chunk_pdf_with_meta(path, chunker)[0]
+
+def pdf_page_count(path: str) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(path).pages)
+
+def iter_pdf_chunks(path: str):
+    """
+    Parses and chunks a PDF one page at a time, yielding (page_number, chunks, metas) so
+    callers never hold more than a single page of text.
+    """
+    import pypdf
+
+    reader = pypdf.PdfReader(path)
+    for page_number, page in enumerate(reader.pages):
+        # Per-page timings go straight to the histograms; a span per page would flood the trace.
+        start = time.perf_counter()
+        text = page.extract_text()
+        parsed = time.perf_counter()
+        chunks, metas = chunk_page(text, page_number)
+        telemetry.observe_stage("ingest.parse_page", parsed - start, pages=1)
+        telemetry.observe_stage("ingest.chunk_page", time.perf_counter() - parsed, chunks=len(chunks))
+        yield page_number, chunks, metas
+
+def _backoff_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter so parallel batches don't retry in lockstep.
+    return random.uniform(0, min(EMBED_BACKOFF_MAX_S, EMBED_BACKOFF_BASE_S * (2 ** attempt)))
+
+async def _embed_batch(index: int, batch: list[str], semaphore: asyncio.Semaphore, on_batch=None,
+                       priority: str = "ingest", source_id: str = None) -> list[list[float]]:
+    provider = get_embedding_provider()
+    # A local provider spends no shared quota, so only remote ones queue for the scheduler.
+    slot = embed_scheduler.slot(priority, source_id) if provider.remote else contextlib.nullcontext()
+    async with semaphore, slot:
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                request = provider.aembed_batch(batch)
+                vectors = await (_on_embed_loop(request) if provider.remote else request)
+                break
+            except Exception as e:
+                if attempt >= EMBED_MAX_RETRIES or not provider.is_retryable(e):
+                    raise
+                delay = _backoff_delay(attempt)
+                attempt += 1
+                logger.warning("Embedding batch %d failed (%s), retry %d in %.2fs", index, e, attempt, delay)
+                await asyncio.sleep(delay)
+
+    timing = EmbedBatchTiming(index=index, size=len(batch), attempts=attempt + 1, seconds=time.perf_counter() - start)
+    telemetry.observe_stage("embed.request", timing.seconds, texts=timing.size)
+    telemetry.EMBED_BATCH_SIZE.observe(timing.size)
+    logger.info("Embedding batch %d: %d texts in %.3fs (%d attempts)", timing.index, timing.size, timing.seconds, timing.attempts)
+    if timing.attempts == 1:
+        # Retried batches mostly measure backoff, not the batch size.
+        _autotuner.observe(timing.size, timing.seconds)
+    if on_batch:
+        on_batch(timing)
+
+    return vectors
+
+def get_embed_cache() -> EmbeddingCache | None:
+    global _embed_cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _embed_cache_lock:
+        if _embed_cache is None:
+            _embed_cache = EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_MB * 1024 * 1024)
+        return _embed_cache
+
+async def aembed_texts(texts: list[str], batch_size: int = None, concurrency: int = None, on_batch=None,
+                       priority: str = "ingest", source_id: str = None) -> list[list[float]]:
+    """
+    Embeds texts in bounded batches through a concurrency-limited pool.
+    Results are returned in input order; on_batch receives an EmbedBatchTiming per batch.
+    Texts already in the embedding cache are served from disk without a network call.
+    Requests to a remote provider go through embed_scheduler as `priority` ("query" or
+    "ingest") on behalf of source_id, and raise SchedulerBusy when it sheds them.
+    """
+    if not texts:
+        return []
+
+    with telemetry.span("embed", texts=len(texts), priority=priority) as embed_span:
+        return await _aembed_texts(texts, batch_size, concurrency, on_batch, embed_span, priority, source_id)
+
+async def _aembed_texts(texts, batch_size, concurrency, on_batch, embed_span, priority, source_id) -> list[list[float]]:
+    provider = get_embedding_provider()
+    # Recomputing a local embedding is about as cheap as reading it back from disk.
+    cache = get_embed_cache() if provider.remote else None
+    if cache is None:
+        return await _embed_uncached(texts, batch_size, concurrency, on_batch, priority, source_id)
+
+    keys = [EmbeddingCache.key(t, provider.model, provider.dim) for t in texts]
+    cached = await asyncio.to_thread(cache.get_many, keys)
+
+    # Embed each distinct missing text once, even if it repeats within the request.
+    missing = {}
+    for k, t in zip(keys, texts):
+        if k not in cached and k not in missing:
+            missing[k] = t
+
+    embed_span.set(cache_hits=len(texts) - len(missing), cache_misses=len(missing))
+    telemetry.CACHE_LOOKUPS.inc(len(texts) - len(missing), cache="embedding", result="hit")
+    telemetry.CACHE_LOOKUPS.inc(len(missing), cache="embedding", result="miss")
+
+    if missing:
+        fresh = await _embed_uncached(list(missing.values()), batch_size, concurrency, on_batch, priority, source_id)
+        fresh_by_key = dict(zip(missing.keys(), fresh))
+        await asyncio.to_thread(cache.put_many, fresh_by_key)
+        cached.update(fresh_by_key)
+
+    return [cached[k] for k in keys]
+
+async def _embed_uncached(texts: list[str], batch_size: int = None, concurrency: int = None, on_batch=None,
+                          priority: str = "ingest", source_id: str = None) -> list[list[float]]:
+    batch_size = batch_size or embed_batch_size()
+    semaphore = asyncio.Semaphore(concurrency or EMBED_CONCURRENCY)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    # gather preserves argument order, so flattening restores the input order.
+    results = await asyncio.gather(*(_embed_batch(i, b, semaphore, on_batch, priority, source_id) for i, b in enumerate(batches)))
+    return [vec for batch_vecs in results for vec in batch_vecs]
+
+# --- Embedding event loop ---
+# The genai client's async transport keeps its connections (httpx pool, or one aiohttp
+# session per loop) bound to the event loop that opened them. Every remote embedding
+# request therefore runs on one long-lived loop in a daemon thread: sync callers submit
+# whole calls to it, async callers on other loops hand it each request. Connections stay
+# alive across batches and ingests instead of dying with a per-call loop.
+def get_embed_loop() -> asyncio.AbstractEventLoop:
+    global _embed_loop
+    if _embed_loop is None:
+        with _embed_loop_lock:
+            if _embed_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="embed-loop", daemon=True).start()
+                _embed_loop = loop
+    return _embed_loop
+
+def _submit(coro) -> concurrent.futures.Future:
+    loop = get_embed_loop()
+    # Carry the caller's context over so spans opened inside nest under the caller's span.
+    context = contextvars.copy_context()
+
+    async def _in_context():
+        return await loop.create_task(coro, context=context)
+
+    return asyncio.run_coroutine_threadsafe(_in_context(), loop)
+
+async def _on_embed_loop(coro):
+    if asyncio.get_running_loop() is get_embed_loop():
+        return await coro
+    return await asyncio.wrap_future(_submit(coro))
+
+def _run_sync(coro):
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is get_embed_loop():
+        coro.close()
+        raise RuntimeError("embed_texts would block the embedding loop; await aembed_texts instead")
+    return _submit(coro).result()
+
+def embed_texts(texts: list[str], batch_size: int = None, concurrency: int = None, on_batch=None,
+                priority: str = "ingest", source_id: str = None) -> list[list[float]]:
+    return _run_sync(aembed_texts(texts, batch_size=batch_size, concurrency=concurrency, on_batch=on_batch,
+                                  priority=priority, source_id=source_id))
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+# --- Document registry configuration ---
+DOC_REGISTRY_PATH = os.getenv("DOC_REGISTRY_PATH", ".cache/documents.sqlite3")
+# A document claimed for indexing longer ago than this is assumed abandoned (crashed run)
+# and can be claimed again.
+DOC_INDEXING_TIMEOUT_S = float(os.getenv("DOC_INDEXING_TIMEOUT_S", "900"))
+
+def document_id(path: str) -> str:
+    """
+    Content address of a PDF: identical bytes map to the same indexed vector set.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return f"doc-{digest.hexdigest()}"
+
+class DocumentRegistry:
+    """
+    Which sessions use which indexed document, kept in SQLite so it survives restarts and
+    is shared by workers on the same host.
+    Each session source_id holds a lease on one document (vector set) until its expires_at;
+    the number of live leases is the document's reference count. A document, its vectors
+    and its upload are only released once its last lease has expired.
+    """
+
+    def __init__(self, path: str = DOC_REGISTRY_PATH, indexing_timeout_s: float = DOC_INDEXING_TIMEOUT_S):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.indexing_timeout_s = indexing_timeout_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, pdf_path TEXT, status TEXT NOT NULL, chunks INTEGER NOT NULL DEFAULT 0, "
+            "claimed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "source_id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leases_doc ON leases(doc_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leases_expires ON leases(expires_at)")
+
+    def acquire(self, source_id: str, doc_id: str, pdf_path: str, expires_at: float, now: float) -> tuple[bool, float]:
+        """
+        Grants source_id a lease on doc_id until expires_at. Returns (should_index,
+        doc_expires_at): should_index is True for the caller that has to parse and embed
+        the document (it is new, or an earlier indexing run failed or was abandoned), and
+        doc_expires_at is the latest expiry over all of the document's leases.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO leases (source_id, doc_id, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(source_id) DO UPDATE SET doc_id = excluded.doc_id, "
+                    "expires_at = MAX(expires_at, excluded.expires_at)",
+                    (source_id, doc_id, expires_at),
+                )
+                row = self._conn.execute("SELECT status, claimed_at FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO documents (doc_id, pdf_path, status, claimed_at) VALUES (?, ?, 'indexing', ?)",
+                        (doc_id, pdf_path, now),
+                    )
+                    should_index = True
+                elif row[0] == "failed" or (row[0] == "indexing" and now - row[1] > self.indexing_timeout_s):
+                    self._conn.execute(
+                        "UPDATE documents SET status = 'indexing', claimed_at = ? WHERE doc_id = ?", (now, doc_id)
+                    )
+                    should_index = True
+                else:
+                    should_index = False
+                doc_expires_at = self._doc_expiry(doc_id)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return should_index, doc_expires_at
+
+    def mark_ready(self, doc_id: str, chunks: int) -> float | None:
+        """
+        Records a finished indexing run. Returns the document's current expiry, which may
+        have moved past the one its vectors were written with while it was indexing.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE documents SET status = 'ready', chunks = ? WHERE doc_id = ?", (chunks, doc_id))
+            return self._doc_expiry(doc_id)
+
+    def mark_failed(self, doc_ids: list[str]):
+        """
+        Gives up the indexing claim on documents whose run raised, so the next acquire
+        re-indexes them right away. Documents that already finished are left alone.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE documents SET status = 'failed' WHERE doc_id = ? AND status = 'indexing'", [(d,) for d in doc_ids]
+            )
+
+    def resolve(self, source_id: str) -> str | None:
+        """
+        The document a session's source_id currently points at, or None without a lease.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT doc_id FROM leases WHERE source_id = ?", (source_id,)).fetchone()
+        return row[0] if row else None
+
+    def document(self, doc_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pdf_path, status, chunks FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"doc_id": doc_id, "pdf_path": row[0], "status": row[1], "chunks": row[2]}
+
+    def extend(self, source_id: str, expires_at: float) -> tuple[str, float] | None:
+        """
+        Pushes a lease's expiry out to expires_at. Returns (doc_id, doc_expires_at), or
+        None if source_id holds no lease.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT doc_id FROM leases WHERE source_id = ?", (source_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE leases SET expires_at = MAX(expires_at, ?) WHERE source_id = ?", (expires_at, source_id)
+            )
+            return row[0], self._doc_expiry(row[0])
+
+    def sources(self, doc_id: str) -> list[str]:
+        """
+        The source_ids currently leasing doc_id.
+        """
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT source_id FROM leases WHERE doc_id = ?", (doc_id,))]
+
+    def refcount(self, doc_id: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM leases WHERE doc_id = ?", (doc_id,)).fetchone()[0]
+
+    def expire(self, now: float) -> tuple[list[str], dict[str, str]]:
+        """
+        Drops every lease that expired before `now`, then every document left without
+        leases. Returns (expired source_ids, {released doc_id: pdf_path}).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [r[0] for r in self._conn.execute("SELECT source_id FROM leases WHERE expires_at < ?", (now,))]
+                self._conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+                released = dict(self._conn.execute(
+                    "SELECT doc_id, pdf_path FROM documents WHERE doc_id NOT IN (SELECT doc_id FROM leases)"
+                ).fetchall())
+                self._conn.execute("DELETE FROM documents WHERE doc_id NOT IN (SELECT doc_id FROM leases)")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return expired, released
+
+    def _doc_expiry(self, doc_id: str) -> float:
+        return self._conn.execute("SELECT MAX(expires_at) FROM leases WHERE doc_id = ?", (doc_id,)).fetchone()[0]
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of embedding vectors.
+    Vectors are stored as float32 blobs in SQLite and evicted least-recently-used once the
+    total stored size exceeds max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, nbytes INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(text: str, model: str, dim: int) -> str:
+        return hashlib.sha256(f"{model}\x00{dim}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """
+        Returns cached vectors for the given keys and refreshes their LRU position.
+        """
+        if not keys:
+            return {}
+
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            # Stay well below SQLite's bound-parameter limit.
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for k, blob in rows:
+                    found[k] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+
+            hit_count = sum(1 for k in keys if k in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+
+        return found
+
+    def put_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+
+        with self._lock:
+            now = time.time()
+            rows = []
+            for k, vec in items.items():
+                blob = np.asarray(vec, dtype=np.float32).tobytes()
+                rows.append((k, blob, len(blob), now))
+
+            existing = self._sizes_of([k for k, *_ in rows])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_access) VALUES (?, ?, ?, ?)", rows
+            )
+            self._size += sum(n for _, _, n, _ in rows) - sum(existing.values())
+            self._evict()
+            self._conn.commit()
+
+    def _sizes_of(self, keys: list[str]) -> dict[str, int]:
+        sizes = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT key, nbytes FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            sizes.update(rows)
+        return sizes
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, nbytes FROM embeddings ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for k, n in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (k,))
+                self._size -= n
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": count,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,251 @@
+import abc
+import asyncio
+import collections
+import hashlib
+import math
+import os
+import re
+import statistics
+import threading
+import numpy as np
+import pydantic
+from vector_db import active_profile
+import telemetry
+
+# --- Embedding provider configuration ---
+# "gemini" (gemini-embedding-001 over the network) or "hashing" (HashingEmbeddingProvider:
+# CPU-local, no network, no API key). The dimension comes from the storage profile either way.
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "gemini")
+GEMINI_EMBED_MODEL = "gemini-embedding-001"
+
+# Rate limiting and transient server-side failures are worth retrying; anything else
+# (bad request, auth) will fail the same way again.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class EmbeddingSpec(pydantic.BaseModel):
+    """
+    What produced a set of vectors. Vectors are only comparable with vectors of the same spec.
+    """
+    provider: str
+    model: str
+    dim: int
+
+    def describe(self) -> str:
+        return f"{self.provider}/{self.model} ({self.dim} dims)"
+
+class EmbeddingMismatch(ValueError):
+    """
+    Stored vectors were built with a different provider, model or dimension than the
+    configured one, so searching them would return meaningless results.
+    """
+
+def check_embedding(recorded: EmbeddingSpec, expected: EmbeddingSpec, where: str):
+    if recorded != expected:
+        raise EmbeddingMismatch(
+            f"{where} was built with {recorded.describe()}, but the configured embedding is {expected.describe()}. "
+            "Point the store at another collection or re-ingest the documents."
+        )
+
+class EmbeddingProvider(abc.ABC):
+    """
+    One way of turning texts into vectors. The batching, retries, caching and scheduling
+    around it live in data_loader; a provider only embeds one batch.
+    """
+    name: str
+    model: str
+    # Remote providers go through the embedding scheduler and cache, and are retried.
+    remote: bool = True
+    # (smallest, largest, initial) texts per batch the autotuner may use.
+    batch_limits: tuple[int, int, int] = (1, 100, 100)
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def spec(self) -> EmbeddingSpec:
+        return EmbeddingSpec(provider=self.name, model=self.model, dim=self.dim)
+
+    @abc.abstractmethod
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return False
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    name = "gemini"
+    model = GEMINI_EMBED_MODEL
+    # The API takes at most 100 texts per request.
+    batch_limits = (8, 100, 100)
+
+    def __init__(self, dim: int, get_client):
+        super().__init__(dim)
+        self._get_client = get_client
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        # Matryoshka embeddings: the storage profile may request a reduced output_dimensionality.
+        response = await self._get_client().aio.models.embed_content(
+            model=self.model,
+            contents=texts,
+            config={
+                "output_dimensionality": self.dim
+            },
+        )
+        return [embedding.values for embedding in response.embeddings]
+
+    def is_retryable(self, exc: Exception) -> bool:
+        import httpx
+        from google.genai import errors
+
+        if isinstance(exc, errors.APIError):
+            return exc.code in RETRYABLE_STATUS
+        return isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError))
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its of on or our she so than that "
+    "the their them then there these they this to was we were what when which who will with you your".split()
+)
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Feature-hashed bag of words and word bigrams: each feature lands in one of `dim`
+    buckets with a hash-derived sign, weighted by sublinear term frequency, and rows are
+    L2-normalized so cosine similarity measures lexical overlap. Deterministic and
+    stateless, so the same text always gets the same vector in every process. A batch is
+    assembled as one NumPy matrix in a worker thread.
+    """
+    name = "hashing"
+    # Bump the version whenever features or weighting change: stored vectors stop matching.
+    model = "hashing-v1"
+    remote = False
+    batch_limits = (16, 1024, 128)
+    # Feature -> hash memo; bounded, since vocabularies are open-ended.
+    max_memo = 500_000
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self._memo: dict[str, int] = {}
+
+    def _hash(self, feature: str) -> int:
+        code = self._memo.get(feature)
+        if code is None:
+            if len(self._memo) >= self.max_memo:
+                self._memo.clear()
+            code = self._memo[feature] = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return code
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows, codes, counts = [], [], []
+        for row, text in enumerate(texts):
+            words = [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+            features = collections.Counter(words)
+            features.update(map(" ".join, zip(words, words[1:])))
+            rows.extend([row] * len(features))
+            codes.extend(map(self._hash, features))
+            counts.extend(features.values())
+
+        codes = np.array(codes, dtype=np.uint64)
+        signs = np.where(codes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        weights = signs * (1.0 + np.log(np.array(counts, dtype=np.float32)))
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.intp), (codes % np.uint64(self.dim)).astype(np.intp)), weights)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        # CPU-bound, so off the event loop.
+        return await asyncio.to_thread(lambda: self.embed(texts).tolist())
+
+PROVIDERS = ("gemini", "hashing")
+
+def create_provider(name: str = None, dim: int = None, get_genai_client=None) -> EmbeddingProvider:
+    name = name or EMBED_PROVIDER
+    dim = dim or active_profile().dim
+    if name == "gemini":
+        return GeminiEmbeddingProvider(dim, get_genai_client)
+    if name == "hashing":
+        return HashingEmbeddingProvider(dim)
+    raise ValueError(f"Unknown EMBED_PROVIDER {name!r}, expected one of {list(PROVIDERS)}")
+
+def active_embedding() -> EmbeddingSpec:
+    """
+    The configured provider's spec, without creating the provider (or its client).
+    """
+    models = {"gemini": GeminiEmbeddingProvider.model, "hashing": HashingEmbeddingProvider.model}
+    if EMBED_PROVIDER not in models:
+        raise ValueError(f"Unknown EMBED_PROVIDER {EMBED_PROVIDER!r}, expected one of {list(PROVIDERS)}")
+    return EmbeddingSpec(provider=EMBED_PROVIDER, model=models[EMBED_PROVIDER], dim=active_profile().dim)
+
+class BatchAutotuner:
+    """
+    Picks the batch size with the best observed throughput (texts/s per request) by hill
+    climbing over powers of two between the provider's limits. Each size is judged on the
+    median of `window` full batches; after both neighbours of the best size lost, it stays
+    there for `settle` windows before probing again, so it follows drifting conditions
+    (rate limits, load) without constantly paying for bad probes.
+    """
+
+    def __init__(self, name: str, minimum: int, maximum: int, initial: int, window: int = 4, settle: int = 8,
+                 tolerance: float = 0.05):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.settle = settle
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        self._size = min(max(initial, minimum), maximum)
+        self._samples: list[float] = []
+        self._best: tuple[int, float] | None = None
+        self._direction = 1
+        self._losses = 0
+        self._hold = 0
+        telemetry.EMBED_BATCH_TARGET.set(self._size, provider=name)
+
+    def size(self) -> int:
+        return self._size
+
+    def observe(self, size: int, seconds: float):
+        """
+        Records one request. Only full batches of the current size count: a short last
+        batch or a single query says nothing about the size being tried.
+        """
+        with self._lock:
+            if size != self._size or seconds <= 0:
+                return
+            self._samples.append(size / seconds)
+            if len(self._samples) >= self.window:
+                self._step(statistics.median(self._samples))
+                self._samples = []
+
+    def _step(self, throughput: float):
+        if self._best is None or self._size == self._best[0]:
+            self._best = (self._size, throughput)
+        elif throughput > self._best[1] * (1 + self.tolerance):
+            self._best = (self._size, throughput)
+            self._losses = 0
+        else:
+            self._direction = -self._direction
+            self._losses += 1
+            if self._losses >= 2:
+                self._losses = 0
+                self._hold = self.settle
+
+        best = self._best[0]
+        if self._hold:
+            self._hold -= 1
+            self._size = best
+        else:
+            candidate = self._neighbour(best, self._direction)
+            if candidate == best:
+                # At a limit: probe the other way.
+                self._direction = -self._direction
+                candidate = self._neighbour(best, self._direction)
+            self._size = candidate
+        telemetry.EMBED_BATCH_TARGET.set(self._size, provider=self.name)
+
+    def _neighbour(self, size: int, direction: int) -> int:
+        exponent = math.log2(size)
+        step = math.floor(exponent) + 1 if direction > 0 else math.ceil(exponent) - 1
+        return min(max(2 ** step, self.minimum), self.maximum)
@@ -1,16 +1,35 @@
+import asyncio
+import contextlib
+import functools
+import inspect
+import json
 import logging
-from fastapi import FastAPI
+import threading
+import time
+import uuid
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 import inngest
 import inngest.fast_api
 from dotenv import load_dotenv
-import uuid
 import os
 import datetime
-from google import genai
-from google.genai import types
-from data_loader import load_and_chunk_pdf, embed_texts
-from vector_db import QdrantStorage
-from custom_types import RAGChunkAndSrc, RAGUpsertResult, RAGSearchResult
+from data_loader import aload_and_chunk_pdfs, aembed_texts, get_genai_client, get_embed_cache, get_embedding_provider, embed_scheduler
+from embedding import EmbeddingMismatch
+from pdf_parsing import get_splitter, warm_parse_pool
+from vector_db import get_storage
+from answer_cache import (
+    AnswerCache, Singleflight, ANSWER_CACHE_ENABLED, ANSWER_CACHE_SEMANTIC, ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_MAX_ENTRIES,
+)
+from result_channel import ResultChannel
+from scheduler import PriorityScheduler, SchedulerBusy, SCHED_LLM_CONCURRENCY, SCHED_LLM_PER_SOURCE
+from document_registry import DocumentRegistry, document_id
+from artifact_store import ArtifactStore
+from context_packing import pack_context
+from chunking import estimate_tokens
+from streaming_ingest import stream_ingest_pdf, ingest_pdf_batch, progress_tracker, chunk_point_id, chunk_payload
+from custom_types import RAGArtifactHandle, RAGUpsertResult, RAGBatchUpsertResult, RAGDocumentLease, RAGDocumentLeases, RAGSearchResult, RAGBatchSearchResult, RAGIngestProgress, RAGQueryRequest, RAGPackedContext
+import telemetry
 
 load_dotenv()
 
@@ -22,7 +41,93 @@ inngest_client = inngest.Inngest(
     serializer=inngest.PydanticSerializer() 
 )
 
-# --- Function 1: Ingest with 10-Minute Auto-Deletion ---
+# How long an uploaded document (and anything derived from it) lives.
+DOC_TTL = datetime.timedelta(seconds=int(os.getenv("DOC_TTL_SECONDS", "600")))
+# Push a document's expiry out by a full TTL every time it is queried.
+EXTEND_TTL_ON_QUERY = os.getenv("EXTEND_TTL_ON_QUERY", "0") == "1"
+# How often the expiry sweeper runs.
+SWEEP_CRON = os.getenv("SWEEP_CRON", "* * * * *")
+
+answer_cache = AnswerCache(
+    ttl_s=DOC_TTL.total_seconds(),
+    semantic=ANSWER_CACHE_SEMANTIC,
+    similarity=ANSWER_CACHE_SIMILARITY,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+)
+answer_flight = Singleflight()
+
+# Uploads are content-addressed: sessions uploading the same PDF lease one shared vector set.
+document_registry = DocumentRegistry()
+
+# Large step outputs (chunk lists) live here; Inngest state only carries their handles.
+artifact_store = ArtifactStore()
+
+# Query results are pushed here so the UI can long-poll instead of polling the Inngest API.
+run_results = ResultChannel()
+
+# "stream" overlaps parsing, embedding and upsert; "batch" parses the whole PDF first.
+INGEST_MODE = os.getenv("INGEST_MODE", "stream")
+
+# --- Batch query configuration ---
+# LLM calls a rag/query_pdf_batch run makes at once, and the most questions one event may carry.
+QUERY_BATCH_LLM_CONCURRENCY = int(os.getenv("QUERY_BATCH_LLM_CONCURRENCY", "4"))
+QUERY_BATCH_MAX_QUESTIONS = int(os.getenv("QUERY_BATCH_MAX_QUESTIONS", "100"))
+
+def traced(ctx: inngest.Context, stage: str, fn):
+    """
+    Wraps a step handler in a span named `stage`. Spans of all steps of one run share the
+    event id as trace id, since Inngest executes each step in a separate request.
+    """
+    if inspect.iscoroutinefunction(fn):
+        async def _run(*args):
+            with telemetry.span(stage, trace_id=ctx.event.id, event=ctx.event.name):
+                return await fn(*args)
+    else:
+        def _run(*args):
+            with telemetry.span(stage, trace_id=ctx.event.id, event=ctx.event.name):
+                return fn(*args)
+    return _run
+
+def acquire_document(source_id: str, pdf_path: str) -> RAGDocumentLease:
+    """
+    Leases the upload's content-addressed vector set to source_id for one TTL. If the
+    document is already indexed (or being indexed) only the lease is added, and the shared
+    vectors' expiry is pushed out to cover it.
+    """
+    now = time.time()
+    doc_id = document_id(pdf_path)
+    expires_at = now + DOC_TTL.total_seconds()
+    should_index, doc_expires_at = document_registry.acquire(source_id, doc_id, pdf_path, expires_at, now)
+    # A re-upload under the same name may point source_id at different content.
+    answer_cache.invalidate_source(source_id)
+    if not should_index:
+        get_storage().extend_expiry(doc_id, doc_expires_at)
+    return RAGDocumentLease(source_id=source_id, doc_id=doc_id, pdf_path=pdf_path, should_index=should_index,
+                            expires_at=expires_at, doc_expires_at=doc_expires_at)
+
+def finish_indexing(doc_id: str, chunks: int, written_expires_at: float):
+    doc_expires_at = document_registry.mark_ready(doc_id, chunks)
+    # Answers given while the document was partly indexed may have missed its later pages.
+    for source_id in document_registry.sources(doc_id):
+        answer_cache.invalidate_source(source_id)
+    # Sessions that joined while this run was indexing extended the lease past what was written.
+    if doc_expires_at and doc_expires_at > written_expires_at:
+        get_storage().extend_expiry(doc_id, doc_expires_at)
+
+@contextlib.asynccontextmanager
+async def indexing_claim(doc_ids: list[str]):
+    """
+    Marks the documents failed if the indexing step raises, so a retry or another upload
+    of the same file indexes them again instead of sharing an empty vector set until
+    DOC_INDEXING_TIMEOUT_S.
+    """
+    try:
+        yield
+    except Exception:
+        await asyncio.to_thread(document_registry.mark_failed, doc_ids)
+        raise
+
+# --- Function 1: Ingest (expired documents are removed by the sweeper below) ---
 @inngest_client.create_function(
     fn_id="RAG: Ingest PDF with TTL",
     trigger=inngest.TriggerEvent(event="rag/ingest_pdf")
@@ -32,41 +137,230 @@ async def rag_ingest_pdf(ctx: inngest.Context):
     pdf_path = ctx.event.data["pdf_path"]
     source_id = ctx.event.data["source_id"]
 
-    # Step 1: Load and Chunk
-    def _load():
-        chunks = load_and_chunk_pdf(pdf_path)
-        return RAGChunkAndSrc(chunks=chunks, source_id=source_id)
+    # Step 0: Lease the document; an identical upload that is already indexed is reused as-is
+    async def _acquire():
+        # Hashing the upload and the registry's SQLite write run in a worker thread.
+        return await asyncio.to_thread(acquire_document, source_id, pdf_path)
 
-    chunks_and_src = await ctx.step.run("load_and_chunk", _load, output_type=RAGChunkAndSrc)
+    lease = await ctx.step.run("acquire_document", traced(ctx, "ingest.acquire_document", _acquire), output_type=RAGDocumentLease)
+    if not lease.should_index:
+        return {"status": "Already indexed; this session shares the existing copy.", "ingested_count": 0,
+                "doc_id": lease.doc_id, "reused": True, "expires_at": lease.expires_at}
 
-    # Step 2: Embed and Upsert to Vector DB
-    def _upsert(data: RAGChunkAndSrc):
-        store = QdrantStorage()
-        vecs = embed_texts(data.chunks)
-        
-        ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{data.source_id}:{i}")) for i in range(len(data.chunks))]
-        payloads = [{"source": data.source_id, "text": t} for t in data.chunks]
+    # Vectors are stored under the document id, so every session leasing it can search them.
+    doc_id = lease.doc_id
+    expires_at = lease.doc_expires_at
 
-        store.upsert(ids, vecs, payloads)
-        return RAGUpsertResult(ingested=len(data.chunks))
+    if ctx.event.data.get("mode", INGEST_MODE) == "stream":
+        # Steps 1+2 (streaming): parse, chunk, embed and upsert page by page
+        async def _stream():
+            # Run off the event loop so progress requests are served while ingesting.
+            async with indexing_claim([doc_id]):
+                ingested_count = await asyncio.to_thread(
+                    stream_ingest_pdf, pdf_path, doc_id, get_storage(), expires_at=expires_at
+                )
+                await asyncio.to_thread(finish_indexing, doc_id, ingested_count, expires_at)
+            return RAGUpsertResult(ingested=ingested_count, expires_at=expires_at)
 
-    ingested = await ctx.step.run("embed_and_upsert", lambda: _upsert(chunks_and_src), output_type=RAGUpsertResult)
+        ingested = await ctx.step.run("stream_ingest", traced(ctx, "ingest.stream_ingest", _stream), output_type=RAGUpsertResult)
+    else:
+        # Step 1: Load and Chunk (the chunks go to the artifact store; the step returns a handle)
+        async def _load():
+            # Parsing is CPU-bound: it runs on the parse workers (or a thread) while the loop keeps serving.
+            async with indexing_claim([doc_id]):
+                chunks, metas = (await aload_and_chunk_pdfs([pdf_path]))[0]
+                return await asyncio.to_thread(artifact_store.put_chunks, chunks, metas, source_id=doc_id)
 
-    # Step 3: Wait for 10 Minutes (FIXED)
-    # datetime.timedelta is used instead of a string to avoid TypeError
-    await ctx.step.sleep("wait_10_min", datetime.timedelta(minutes=10))
+        handle = await ctx.step.run("load_and_chunk", traced(ctx, "ingest.load_and_chunk", _load), output_type=RAGArtifactHandle)
 
-    # Step 4: Cleanup
-    def _cleanup():
-        QdrantStorage().delete_by_source(source_id)
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-        return "Cleanup successful"
+        # Step 2: Embed and Upsert to Vector DB
+        async def _upsert(handle: RAGArtifactHandle):
+            async with indexing_claim([handle.source_id]):
+                chunks, metas = await asyncio.to_thread(artifact_store.get_chunks, handle)
+                store = get_storage()
+                vecs = await aembed_texts(chunks, priority="ingest", source_id=handle.source_id)
+
+                ids = [chunk_point_id(handle.source_id, i) for i in range(len(chunks))]
+                metas = metas or [None] * len(chunks)
+                payloads = [
+                    chunk_payload(handle.source_id, i, t, m, expires_at, pdf_path)
+                    for i, (t, m) in enumerate(zip(chunks, metas))
+                ]
+
+                await store.aupsert(ids, vecs, payloads)
+                await asyncio.to_thread(finish_indexing, handle.source_id, len(chunks), expires_at)
+            # Only removed once the step succeeded, so a retried step still finds it.
+            await asyncio.to_thread(artifact_store.delete, handle)
+            return RAGUpsertResult(ingested=len(chunks), expires_at=expires_at)
+
+        ingested = await ctx.step.run("embed_and_upsert", traced(ctx, "ingest.embed_and_upsert", functools.partial(_upsert, handle)),
+                                      output_type=RAGUpsertResult)
+
+    return {"status": "Ingested; the expiry sweeper removes it after the TTL.", "ingested_count": ingested.ingested,
+            "doc_id": doc_id, "reused": False, "expires_at": lease.expires_at}
+
+# --- Function 1b: Batch Ingest (several PDFs, parsed in parallel and embedded together) ---
+@inngest_client.create_function(
+    fn_id="RAG: Ingest PDF Batch",
+    trigger=inngest.TriggerEvent(event="rag/ingest_pdf_batch")
+)
+async def rag_ingest_pdf_batch(ctx: inngest.Context):
+    # Each file keeps its own source_id, so it can be queried (and expires) on its own.
+    files = [(f["pdf_path"], f["source_id"]) for f in ctx.event.data.get("files") or []]
+    if not files:
+        return {"error": "No files to ingest.", "ingested": {}, "reused": [], "ingested_count": 0}
+
+    # Step 0: Lease every document; only ones not indexed yet (and not repeated in this batch) are ingested
+    async def _acquire():
+        return RAGDocumentLeases(leases=await asyncio.to_thread(
+            lambda: [acquire_document(source_id, path) for path, source_id in files]))
+
+    leases = (await ctx.step.run("acquire_documents", traced(ctx, "ingest.acquire_documents", _acquire),
+                                 output_type=RAGDocumentLeases)).leases
+    to_index = [lease for lease in leases if lease.should_index]
+
+    async def _ingest():
+        expires_at = max(lease.doc_expires_at for lease in to_index)
+        async with indexing_claim([lease.doc_id for lease in to_index]):
+            ingested = await asyncio.to_thread(
+                ingest_pdf_batch, [(lease.pdf_path, lease.doc_id) for lease in to_index], get_storage(), expires_at=expires_at
+            )
+            for doc_id, count in ingested.items():
+                await asyncio.to_thread(finish_indexing, doc_id, count, expires_at)
+        return RAGBatchUpsertResult(ingested=ingested, expires_at=expires_at)
+
+    result = RAGBatchUpsertResult(ingested={})
+    if to_index:
+        result = await ctx.step.run("batch_ingest", traced(ctx, "ingest.batch_ingest", _ingest), output_type=RAGBatchUpsertResult)
+
+    return {"status": "Ingested; the expiry sweeper removes them after the TTL.",
+            "ingested": {lease.source_id: result.ingested.get(lease.doc_id, 0) for lease in to_index},
+            "reused": [lease.source_id for lease in leases if not lease.should_index],
+            "ingested_count": sum(result.ingested.values()), "expires_at": max(lease.expires_at for lease in leases)}
+
+# --- Query helpers (shared by the Inngest function and the streaming endpoint) ---
+logger = logging.getLogger("uvicorn")
+
+LLM_MODEL = "gemma-3-27b"
+SYSTEM_INSTRUCTION = "You are a helpful assistant. Answer questions using only the provided context."
+NO_CONTEXT_ANSWER = "I cannot answer this question because the document context is missing or the session has expired."
+BUSY_ANSWER = "The service is busy right now. Please try again in a few seconds."
+BUSY_RETRY_AFTER_S = 2
+
+# LLM calls are interactive only, but still capped per worker and per source_id.
+llm_scheduler = PriorityScheduler("llm", SCHED_LLM_CONCURRENCY, per_source=SCHED_LLM_PER_SOURCE)
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client() -> "genai.Client":
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                from google import genai
+                _llm_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    return _llm_client
+
+async def search_contexts(q: str, k: int, sid: str) -> RAGSearchResult:
+    return (await search_contexts_batch([q], k, sid)).results[0]
+
+async def search_contexts_batch(questions: list[str], k: int, sid: str) -> RAGBatchSearchResult:
+    """
+    Embeds all questions in one aembed_texts call and searches them in one batch request,
+    without blocking the event loop. Raises SchedulerBusy if the embedding is shed.
+    """
+    start = time.perf_counter()
+    query_vecs = await aembed_texts(questions, priority="query", source_id=sid)
+    store = get_storage()
+    # Sessions search the shared document they lease; sources without a lease are stored under their own id.
+    doc_id = await asyncio.to_thread(document_registry.resolve, sid) or sid
+    found = await store.asearch_batch(query_vecs, top_k=k, source_filter=doc_id) if len(questions) > 1 \
+        else [await store.asearch(query_vecs[0], top_k=k, source_filter=doc_id)]
+    if EXTEND_TTL_ON_QUERY and any(f["contexts"] for f in found):
+        expires_at = time.time() + DOC_TTL.total_seconds()
+        extended = await asyncio.to_thread(document_registry.extend, sid, expires_at)
+        await store.aextend_expiry(doc_id, extended[1] if extended else expires_at)
+
+    results = []
+    for f in found:
+        # Report the session's own source id rather than the shared document id.
+        sources = [sid] if doc_id != sid and f["sources"] else f["sources"]
+        results.append(RAGSearchResult(contexts=f["contexts"], sources=sources, hits=f.get("hits", [])))
+    return RAGBatchSearchResult(results=results, seconds=time.perf_counter() - start)
+
+def assemble_context(found: RAGSearchResult, trace_id: str = None) -> RAGPackedContext:
+    """
+    Merges overlapping hits, drops near-duplicates and fits the rest into the token budget.
+    """
+    hits = found.hits or [{"text": c} for c in found.contexts]
+    with telemetry.span("query.pack_context", trace_id=trace_id, hits=len(hits)) as pack_span:
+        packed = pack_context(hits)
+        pack_span.set(tokens_in=packed.tokens_in, tokens_out=packed.tokens_out)
+    logger.info("Context packed: %d -> %d tokens (%d saved) from %d hits into %d passages",
+                packed.tokens_in, packed.tokens_out, packed.tokens_saved, len(hits), len(packed.contexts))
+    return packed
+
+def build_prompt(q: str, context: str) -> str:
+    return (
+        "Use the following context to answer the question.\n\n"
+        f"Context:\n{context}\n\n"
+        f"Question: {q}\n"
+        "Answer concisely using the context above."
+    )
 
-    await ctx.step.run("cleanup_data", _cleanup)
+def _generation_config() -> "types.GenerateContentConfig":
+    from google.genai import types
 
-    return {"status": "Session expired, data wiped.", "ingested_count": ingested.ingested}
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_INSTRUCTION,
+        temperature=0.1,
+        max_output_tokens=1500,
+    )
 
+async def generate_answer(q: str, context: str, source_id: str = None) -> str:
+    prompt = build_prompt(q, context)
+    async with llm_scheduler.slot("query", source_id):
+        with telemetry.span("llm.generate", model=LLM_MODEL, tokens_in=estimate_tokens(prompt)) as llm_span:
+            response = await get_llm_client().aio.models.generate_content(
+                model=LLM_MODEL,
+                contents=prompt,
+                config=_generation_config(),
+            )
+            llm_span.set(tokens_out=estimate_tokens(response.text or ""))
+
+    return response.text
+
+async def stream_answer(q: str, context: str, source_id: str = None):
+    """
+    Yields answer text fragments as the model produces them. The LLM slot is held until
+    the stream ends.
+    """
+    async with llm_scheduler.slot("query", source_id):
+        stream = await get_llm_client().aio.models.generate_content_stream(
+            model=LLM_MODEL,
+            contents=build_prompt(q, context),
+            config=_generation_config(),
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+def format_context(contexts: list[str]) -> str:
+    return "\n\n".join(f"- {c}" for c in contexts)
+
+def busy_result() -> dict:
+    return {"answer": BUSY_ANSWER, "sources": [], "num_contexts": 0, "busy": True}
+
+async def _cache_answer(source_id: str, question: str, top_k: int, result: dict):
+    if ANSWER_CACHE_ENABLED:
+        query_vec = None
+        if answer_cache.semantic:
+            try:
+                query_vec = (await aembed_texts([question], priority="query", source_id=source_id))[0]
+            except SchedulerBusy:
+                pass  # Still cached for exact repeats, just not for similar questions.
+        answer_cache.put(source_id, question, top_k, result, query_vector=query_vec)
 
 # --- Function 2: Query with Isolation ---
 @inngest_client.create_function(
@@ -74,6 +368,12 @@ async def rag_ingest_pdf(ctx: inngest.Context):
     trigger=inngest.TriggerEvent(event="rag/query_pdf_ai")
 )
 async def rag_query_pdf_ai(ctx: inngest.Context):
+    result = await _query_pdf(ctx)
+    # Only reached when the run completes; intermediate step requests exit via Inngest's interrupts.
+    run_results.publish(ctx.event.id, result)
+    return result
+
+async def _query_pdf(ctx: inngest.Context) -> dict:
     question = ctx.event.data["question"]
     top_k = int(ctx.event.data.get("top_k", 5))
     source_id = ctx.event.data.get("source_id")
@@ -81,54 +381,428 @@ async def rag_query_pdf_ai(ctx: inngest.Context):
     if not source_id:
         return {"answer": "Error: No active document session found.", "sources": [], "num_contexts": 0}
 
-    # Step 1: Search Vector DB
-    def _search(q, k, sid):
-        query_vec = embed_texts([q])[0]
-        store = QdrantStorage()
-        found = store.search(query_vec, top_k=k, source_filter=sid)
-        return RAGSearchResult(contexts=found["contexts"], sources=found["sources"])
-    
-    found = await ctx.step.run("embed_and_search", lambda: _search(question, top_k, source_id), output_type=RAGSearchResult)
+    # Step 0: Reuse a cached answer for the same (or, in semantic mode, a near-identical) question
+    async def _cached_answer():
+        if not ANSWER_CACHE_ENABLED:
+            return {}
+        cached = answer_cache.get(source_id, question, top_k)
+        if cached is None and answer_cache.semantic:
+            # The question embedding lands in the embedding cache, so the search step below reuses it.
+            with contextlib.suppress(SchedulerBusy):
+                query_vec = (await aembed_texts([question], priority="query", source_id=source_id))[0]
+                cached = answer_cache.get_similar(source_id, top_k, query_vec)
+        telemetry.CACHE_LOOKUPS.inc(cache="answer", result="hit" if cached else "miss")
+        return cached or {}
+
+    cached = await ctx.step.run("answer_cache_lookup", traced(ctx, "query.answer_cache_lookup", _cached_answer))
+    if cached:
+        return cached
+
+    # Step 1: Search Vector DB (shed with a busy answer rather than queueing behind a backlog)
+    async def _search():
+        try:
+            return await search_contexts(question, top_k, source_id)
+        except SchedulerBusy:
+            return RAGSearchResult(contexts=[], sources=[], busy=True)
 
+    found = await ctx.step.run("embed_and_search", traced(ctx, "query.embed_and_search", _search), output_type=RAGSearchResult)
+
+    if found.busy:
+        return busy_result()
     if not found.contexts:
         return {
-            "answer": "I cannot answer this question because the document context is missing or the session has expired.",
+            "answer": NO_CONTEXT_ANSWER,
             "sources": [],
             "num_contexts": 0
         }
 
     # Step 2: Generate Answer
-    context_block = "\n\n".join(f"- {c}" for c in found.contexts)
-    
-    def _generate_answer(q, context):
-        client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-        
-        system_instruction = "You are a helpful assistant. Answer questions using only the provided context."
-        
-        user_prompt = (
-            "Use the following context to answer the question.\n\n"
-            f"Context:\n{context}\n\n"
-            f"Question: {q}\n"
-            "Answer concisely using the context above."
-        )
+    packed = assemble_context(found, trace_id=ctx.event.id)
+    context_block = format_context(packed.contexts)
 
-        response = client.models.generate_content(
-            model="gemma-3-27b", 
-            contents=user_prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.1,
-                max_output_tokens=1500,
-            )
-        )
+    async def _answer_once():
+        # Identical in-flight questions share one LLM call; the leader fills the cache for later ones.
+        async def _compute():
+            answer = await generate_answer(question, context_block, source_id)
+            result = {"answer": answer, "sources": found.sources, "num_contexts": len(found.contexts),
+                      "context_tokens": packed.tokens_out, "context_tokens_saved": packed.tokens_saved}
+            await _cache_answer(source_id, question, top_k, result)
+            return result
+
+        try:
+            return await answer_flight.do(AnswerCache.key(source_id, question, top_k), _compute)
+        except SchedulerBusy:
+            return busy_result()
+
+    return await ctx.step.run("llm_answer", traced(ctx, "query.llm_answer", _answer_once))
+
+# --- Function 2b: Batched questions about one document ---
+@inngest_client.create_function(
+    fn_id="RAG: Query PDF Batch",
+    trigger=inngest.TriggerEvent(event="rag/query_pdf_batch")
+)
+async def rag_query_pdf_batch(ctx: inngest.Context):
+    result = await _query_pdf_batch(ctx)
+    run_results.publish(ctx.event.id, result)
+    return result
+
+async def _query_pdf_batch(ctx: inngest.Context) -> dict:
+    """
+    Answers event.data["questions"] about one source: cached answers are reused, the rest
+    are embedded in one call and searched in one batch request, and their LLM calls run
+    concurrently (QUERY_BATCH_LLM_CONCURRENCY). Returns one result per question, in order,
+    plus per-stage timing.
+    """
+    questions = [str(q) for q in ctx.event.data.get("questions", [])]
+    top_k = int(ctx.event.data.get("top_k", 5))
+    source_id = ctx.event.data.get("source_id")
+
+    if not source_id:
+        return {"error": "No active document session found.", "results": [], "timing": {}}
+    if len(questions) > QUERY_BATCH_MAX_QUESTIONS:
+        return {"error": f"At most {QUERY_BATCH_MAX_QUESTIONS} questions per batch.", "results": [], "timing": {}}
+
+    # Step 0: Cached answers, exact matches only; a semantic lookup would embed every question twice.
+    async def _cached_answers():
+        start = time.perf_counter()
+        answers = [answer_cache.get(source_id, q, top_k) if ANSWER_CACHE_ENABLED else None for q in questions]
+        hits = sum(a is not None for a in answers)
+        telemetry.CACHE_LOOKUPS.inc(hits, cache="answer", result="hit")
+        telemetry.CACHE_LOOKUPS.inc(len(questions) - hits, cache="answer", result="miss")
+        return {"answers": [a or {} for a in answers], "seconds": time.perf_counter() - start}
+
+    cached = await ctx.step.run("answer_cache_lookup", traced(ctx, "query.batch_answer_cache_lookup", _cached_answers))
+    pending = [i for i, answer in enumerate(cached["answers"]) if not answer]
+
+    # Step 1: One embedding call and one vector search round trip for every uncached question
+    async def _search():
+        try:
+            return await search_contexts_batch([questions[i] for i in pending], top_k, source_id)
+        except SchedulerBusy:
+            return RAGBatchSearchResult(results=[RAGSearchResult(contexts=[], sources=[], busy=True) for _ in pending], busy=True)
+
+    found = RAGBatchSearchResult(results=[])
+    if pending:
+        found = await ctx.step.run("embed_and_search", traced(ctx, "query.batch_embed_and_search", _search),
+                                   output_type=RAGBatchSearchResult)
+
+    # Step 2: Generate the missing answers concurrently
+    async def _answer_all():
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(QUERY_BATCH_LLM_CONCURRENCY)
+
+        async def _answer(question: str, hits: RAGSearchResult) -> dict:
+            if hits.busy:
+                return busy_result()
+            if not hits.contexts:
+                return {"answer": NO_CONTEXT_ANSWER, "sources": [], "num_contexts": 0}
+            # A retried step finds the answers its earlier attempt already produced here.
+            cached_answer = answer_cache.get(source_id, question, top_k) if ANSWER_CACHE_ENABLED else None
+            if cached_answer:
+                return cached_answer
+            packed = assemble_context(hits, trace_id=ctx.event.id)
+
+            async def _compute():
+                async with semaphore:
+                    llm_start = time.perf_counter()
+                    answer = await generate_answer(question, format_context(packed.contexts), source_id)
+                    llm_seconds = time.perf_counter() - llm_start
+                result = {"answer": answer, "sources": hits.sources, "num_contexts": len(hits.contexts),
+                          "context_tokens": packed.tokens_out, "context_tokens_saved": packed.tokens_saved}
+                await _cache_answer(source_id, question, top_k, result)
+                return {**result, "llm_seconds": llm_seconds}
+
+            try:
+                return await answer_flight.do(AnswerCache.key(source_id, question, top_k), _compute)
+            except SchedulerBusy:
+                return busy_result()
+
+        answers = await asyncio.gather(*(_answer(questions[i], hits) for i, hits in zip(pending, found.results)))
+        return {"answers": answers, "seconds": time.perf_counter() - start}
+
+    generated = {"answers": [], "seconds": 0.0}
+    if pending:
+        generated = await ctx.step.run("llm_answers", traced(ctx, "query.batch_llm_answers", _answer_all))
+
+    results = [{"question": q, **answer, "cached": True} for q, answer in zip(questions, cached["answers"])]
+    for i, answer in zip(pending, generated["answers"]):
+        results[i] = {"question": questions[i], **answer, "cached": False}
+
+    llm_seconds = [r["llm_seconds"] for r in results if "llm_seconds" in r]
+    timing = {
+        "questions": len(questions),
+        "cached": len(questions) - len(pending),
+        "busy": sum(bool(r.get("busy")) for r in results),
+        "llm_calls": len(llm_seconds),
+        "llm_concurrency": QUERY_BATCH_LLM_CONCURRENCY,
+        "answer_cache_lookup_s": cached["seconds"],
+        "embed_and_search_s": found.seconds,
+        "llm_answers_s": generated["seconds"],
+        "llm_call_s_total": sum(llm_seconds),
+        "total_s": cached["seconds"] + found.seconds + generated["seconds"],
+    }
+    return {"results": results, "timing": timing}
+
+# --- Function 3: Expiry Sweeper ---
+def sweep_expired(now: float) -> dict:
+    """
+    Removes every expired document in one pass. Expired session leases are dropped first;
+    a shared document is only deleted once its last lease is gone. Vectors go with one
+    filtered delete (per collection), then the matching uploads and in-process caches.
+    """
+    expired_leases, released = document_registry.expire(now)
+    for source_id in expired_leases:
+        answer_cache.invalidate_source(source_id)
+
+    store = get_storage()
+    removed = store.delete_expired(now)
+    for doc_id, pdf_path in released.items():
+        if doc_id not in removed:
+            # Released before its vectors expired, e.g. its only session re-uploaded a changed file.
+            store.delete_by_source(doc_id)
+            removed[doc_id] = pdf_path
+
+    # Artifacts of ingest runs that failed for good and were never cleaned up.
+    artifacts_removed = artifact_store.sweep(now)
 
-        return response.text
-    
-    answer = await ctx.step.run("llm_answer", lambda: _generate_answer(question, context_block))
+    files_removed = 0
+    for source_id, pdf_path in removed.items():
+        progress_tracker.discard(source_id)
+        answer_cache.invalidate_source(source_id)
+        # Uploads are content-addressed, so never delete one a live lease still points at.
+        if pdf_path and os.path.exists(pdf_path) and not document_registry.refcount(source_id):
+            os.remove(pdf_path)
+            files_removed += 1
+
+    return {"leases_expired": len(expired_leases), "sources_removed": len(removed), "files_removed": files_removed,
+            "artifacts_removed": artifacts_removed}
+
+@inngest_client.create_function(
+    fn_id="RAG: Sweep Expired Documents",
+    trigger=inngest.TriggerCron(cron=SWEEP_CRON)
+)
+async def rag_sweep_expired(ctx: inngest.Context):
+    async def _sweep():
+        # Registry writes, vector deletes and file removal all block, so the pass runs in a worker thread.
+        return await asyncio.to_thread(sweep_expired, time.time())
+
+    return await ctx.step.run("sweep_expired", traced(ctx, "sweep.sweep_expired", _sweep))
+
+# --- Warm-up ---
+# Heavy dependencies and clients load on first use, so the server answers Inngest's
+# handshake quickly. warmup() loads them ahead of the first real request instead.
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+# Open the vector store before serving, so a collection built with another embedding
+# provider, model or dimension stops the server instead of answering from bad vectors.
+EMBED_CHECK_ON_START = os.getenv("EMBED_CHECK_ON_START", "1") == "1"
 
-    return {"answer": answer, "sources": found.sources, "num_contexts": len(found.contexts)}
+_warmed: dict[str, float] = {}
+_warmup_lock = threading.Lock()
+
+def warm_embedding_provider():
+    # Only a remote provider needs the Gemini client; the local one has nothing to load.
+    if get_embedding_provider().remote:
+        get_genai_client()
+
+def check_vector_store():
+    """
+    Opens the vector store, which compares each collection's recorded embedding with the
+    configured one. A mismatch is raised; an unreachable store is only logged, since the
+    steps retry it on first use.
+    """
+    try:
+        get_storage()
+    except EmbeddingMismatch:
+        raise
+    except Exception as e:
+        logger.warning("Vector store check at startup failed: %s", e)
+
+def warmup() -> dict:
+    """
+    Loads the embedding provider and Gemini clients, the vector store (connection and collection check), the
+    text splitter, the PDF parse workers and the embedding cache. Returns seconds per
+    component; a component that fails is reported and retried on the next call.
+    """
+    components = {
+        "embedding_provider": warm_embedding_provider,
+        "llm_client": get_llm_client,
+        "vector_store": get_storage,
+        "splitter": get_splitter,
+        "parse_pool": warm_parse_pool,
+        "embed_cache": get_embed_cache,
+    }
+    report = {}
+    with _warmup_lock:
+        for name, load in components.items():
+            if name in _warmed:
+                report[name] = _warmed[name]
+                continue
+            start = time.perf_counter()
+            try:
+                load()
+            except Exception as e:
+                logger.warning("Warm-up of %s failed: %s", name, e)
+                report[name] = f"failed: {e}"
+                continue
+            _warmed[name] = report[name] = time.perf_counter() - start
+            telemetry.observe_stage(f"warmup.{name}", _warmed[name])
+    return report
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    if EMBED_CHECK_ON_START:
+        await asyncio.to_thread(check_vector_store)
+    if WARMUP_ON_START:
+        # In a worker thread: the server starts listening while the warm-up runs.
+        asyncio.get_running_loop().run_in_executor(None, warmup)
+    yield
 
 # --- FastAPI App Definition ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def query_stream(request: RAGQueryRequest):
+    """
+    Streams the answer as server-sent events: `token` events carry text fragments, a final
+    `done` event carries sources and timings (time-to-first-token and total). Identical
+    questions in flight at once share one search and LLM call (answer_flight); the requests
+    that joined get the answer as a single `token` event. Returns 503 right away if the
+    query queues are full.
+    """
+    if embed_scheduler.overloaded("query") or llm_scheduler.overloaded("query"):
+        return Response(json.dumps({"detail": BUSY_ANSWER}), status_code=503, media_type="application/json",
+                        headers={"Retry-After": str(BUSY_RETRY_AFTER_S)})
+
+    async def _events():
+        start = time.perf_counter()
+        ttft_ms = None
+        # Spans can't stay open across yields of this generator, so they're grouped by an explicit trace id.
+        trace_id = uuid.uuid4().hex
+
+        if ANSWER_CACHE_ENABLED:
+            cached = answer_cache.get(request.source_id, request.question, request.top_k)
+            telemetry.CACHE_LOOKUPS.inc(cache="answer", result="hit" if cached else "miss")
+            if cached:
+                ttft_ms = (time.perf_counter() - start) * 1000
+                yield _sse("token", {"text": cached["answer"]})
+                yield _sse("done", {"sources": cached["sources"], "num_contexts": cached["num_contexts"],
+                                    "ttft_ms": ttft_ms, "total_ms": ttft_ms, "cached": True})
+                return
+
+        tokens: asyncio.Queue[str] = asyncio.Queue()
+        timing = {}
+
+        async def _compute():
+            # Runs only for the first of identical concurrent requests (answer_flight); it streams
+            # its tokens through the queue, and every request gets the returned result.
+            with telemetry.span("query.embed_and_search", trace_id=trace_id, streaming=True):
+                found = await search_contexts(request.question, request.top_k, request.source_id)
+            timing["search_ms"] = (time.perf_counter() - start) * 1000
+            if not found.contexts:
+                return {"answer": NO_CONTEXT_ANSWER, "sources": [], "num_contexts": 0}
+
+            packed = assemble_context(found, trace_id=trace_id)
+            parts = []
+            llm_start = time.perf_counter()
+            async for text in stream_answer(request.question, format_context(packed.contexts), request.source_id):
+                if not parts:
+                    telemetry.observe_stage("llm.time_to_first_token", time.perf_counter() - llm_start)
+                parts.append(text)
+                tokens.put_nowait(text)
+            answer_text = "".join(parts)
+            telemetry.observe_stage("llm.stream", time.perf_counter() - llm_start, tokens_out=estimate_tokens(answer_text))
+
+            result = {"answer": answer_text, "sources": found.sources, "num_contexts": len(found.contexts),
+                      "context_tokens": packed.tokens_out, "context_tokens_saved": packed.tokens_saved}
+            await _cache_answer(request.source_id, request.question, request.top_k, result)
+            return result
+
+        key = AnswerCache.key(request.source_id, request.question, request.top_k)
+        flight = asyncio.ensure_future(answer_flight.do(key, _compute))
+        streamed = False
+        try:
+            while True:
+                next_token = asyncio.ensure_future(tokens.get())
+                await asyncio.wait({next_token, flight}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_token.done():
+                    next_token.cancel()
+                    break
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                streamed = True
+                yield _sse("token", {"text": next_token.result()})
+            result = flight.result()
+        except SchedulerBusy as e:
+            logger.warning("Streaming answer shed: %s", e)
+            yield _sse("error", {"detail": BUSY_ANSWER, "busy": True})
+            return
+        except Exception as e:
+            logger.exception("Streaming answer failed")
+            telemetry.STAGE_ERRORS.inc(stage="llm.stream")
+            yield _sse("error", {"detail": str(e)})
+            return
+        finally:
+            if not flight.done():
+                # The client went away: the answer still completes for coalesced requests and the
+                # cache, and its outcome is retrieved so a failure isn't logged as unhandled.
+                flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        if not streamed:
+            # No contexts, or a coalesced request: the leader's answer arrives in one piece.
+            ttft_ms = (time.perf_counter() - start) * 1000
+            yield _sse("token", {"text": result["answer"]})
+        total_ms = (time.perf_counter() - start) * 1000
+        search_ms = timing.get("search_ms")
+        logger.info("Streamed answer: search=%s ttft=%.0fms total=%.0fms coalesced=%s",
+                    f"{search_ms:.0f}ms" if search_ms is not None else "-", ttft_ms, total_ms, not timing)
+        yield _sse("done", {"sources": result["sources"], "num_contexts": result["num_contexts"],
+                            "context_tokens": result.get("context_tokens", 0),
+                            "context_tokens_saved": result.get("context_tokens_saved", 0),
+                            "search_ms": search_ms, "ttft_ms": ttft_ms, "total_ms": total_ms,
+                            "coalesced": not timing})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/runs/{event_id}/result")
+async def run_result(event_id: str, timeout: float = 25.0):
+    """
+    Long-polls for a query run's output. Returns 204 if it isn't published within `timeout`
+    (capped at 60s); the client then checks the Inngest API once and polls again.
+    """
+    result = await run_results.wait(event_id, min(max(timeout, 0.0), 60.0))
+    if result is None:
+        return Response(status_code=204)
+    return result
+
+@app.post("/warmup")
+async def warm_up():
+    """
+    Runs the warm-up now (a no-op for components already loaded) and returns its timings.
+    """
+    return await asyncio.to_thread(warmup)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Stage latency histograms, error and item counters and cache hit rates in the
+    Prometheus text format.
+    """
+    return Response(telemetry.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/ingest/progress/{source_id:path}", response_model=RAGIngestProgress)
+async def ingest_progress(source_id: str):
+    # Progress is tracked per document; a session reusing an indexed document sees it as done.
+    # Registry lookups are SQLite reads, so they run in a worker thread like the steps' calls.
+    doc_id = await asyncio.to_thread(document_registry.resolve, source_id) or source_id
+    progress = progress_tracker.get(doc_id)
+    if progress is None:
+        doc = await asyncio.to_thread(document_registry.document, doc_id)
+        if doc is None or doc["status"] != "ready":
+            raise HTTPException(status_code=404, detail="No ingest in progress for this source")
+        progress = RAGIngestProgress(source_id=doc_id, status="done", chunks_done=doc["chunks"])
+    return progress.model_copy(update={"source_id": source_id})
 
-inngest.fast_api.serve(app, inngest_client, functions=[rag_ingest_pdf, rag_query_pdf_ai])
+inngest.fast_api.serve(app, inngest_client, functions=[rag_ingest_pdf, rag_ingest_pdf_batch, rag_query_pdf_ai, rag_query_pdf_batch, rag_sweep_expired])
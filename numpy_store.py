@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+import numpy as np
+from vector_db import VectorStore, active_profile, check_source_filter, search_result
+import telemetry
+
+NUMPY_STORE_TTL_S = float(os.getenv("NUMPY_STORE_TTL_S", "600"))
+
+class _SourceIndex:
+    """
+    One source's vectors as a contiguous, L2-normalized float32 matrix (rows beyond
+    `size` are spare capacity) plus the matching ids and payloads.
+    """
+
+    def __init__(self, dim: int, expires_at: float):
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        self.size = 0
+        self.ids: list = []
+        self.payloads: list[dict] = []
+        self.rows: dict = {}
+        self.expires_at = expires_at
+
+    def add(self, ids, vectors: np.ndarray, payloads):
+        new_ids = [i for i in ids if i not in self.rows]
+        needed = self.size + len(new_ids)
+        if needed > len(self.matrix):
+            # Grow geometrically so repeated batch upserts stay amortized O(n).
+            grown = np.empty((max(needed, 2 * len(self.matrix), 64), self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+
+        for point_id, vec, payload in zip(ids, vectors, payloads):
+            row = self.rows.get(point_id)
+            if row is None:
+                row = self.size
+                self.rows[point_id] = row
+                self.ids.append(point_id)
+                self.payloads.append(payload)
+                self.size += 1
+            else:
+                self.payloads[row] = payload
+            self.matrix[row] = vec
+
+    def scores(self, q: np.ndarray) -> np.ndarray:
+        return self.matrix[:self.size] @ q
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process exact vector search for per-session documents.
+    Each source lives in its own matrix, so a filtered query is one matrix-vector product
+    plus argpartition over that source's rows only. Sources expire at the latest
+    `expires_at` in their payloads, or `ttl_s` after their last upsert without one.
+    """
+
+    def __init__(self, dim: int = None, ttl_s: float = NUMPY_STORE_TTL_S):
+        self.dim = dim or active_profile().dim
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._sources: dict[str, _SourceIndex] = {}
+        # Sources evicted lazily, kept until the next delete_expired so their files get removed.
+        self._evicted: dict[str, str] = {}
+
+    @staticmethod
+    def _normalize(x: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(x, axis=-1, keepdims=True)
+        return x / np.where(norms == 0, 1.0, norms)
+
+    def _evict_expired(self, now: float):
+        for source in [s for s, idx in self._sources.items() if idx.expires_at <= now]:
+            index = self._sources.pop(source)
+            self._evicted[source] = index.payloads[0].get("pdf_path") if index.payloads else None
+
+    def upsert(self, ids, vectors, payloads):
+        """
+        Uploads vectors to the in-process index.
+        """
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim))
+        by_source: dict[str, list[int]] = {}
+        for i, payload in enumerate(payloads):
+            by_source.setdefault(payload.get("source", ""), []).append(i)
+
+        now = time.time()
+        with telemetry.span("vector.upsert", backend="numpy", points=len(ids)), self._lock:
+            self._evict_expired(now)
+            for source, rows in by_source.items():
+                index = self._sources.get(source)
+                if index is None:
+                    index = self._sources[source] = _SourceIndex(self.dim, now + self.ttl_s)
+                index.expires_at = max(payloads[r].get("expires_at", now + self.ttl_s) for r in rows)
+                index.add([ids[r] for r in rows], matrix[rows], [payloads[r] for r in rows])
+
+    def delete_by_source(self, source_id: str):
+        """
+        Deletes all vectors associated with a specific source_id.
+        """
+        with self._lock:
+            self._sources.pop(source_id, None)
+
+    def delete_expired(self, now: float) -> dict[str, str]:
+        with self._lock:
+            self._evict_expired(now)
+            removed, self._evicted = self._evicted, {}
+        return removed
+
+    def extend_expiry(self, source_id: str, expires_at: float):
+        with self._lock:
+            index = self._sources.get(source_id)
+            if index is not None:
+                index.expires_at = expires_at
+
+    def search(self, query_vector, top_k: int = 5, source_filter: str = None):
+        """
+        Exact cosine top-k, restricted to source_filter when given.
+        """
+        check_source_filter(source_filter)
+        q = self._normalize(np.asarray(query_vector, dtype=np.float32))
+
+        with telemetry.span("vector.search", backend="numpy", top_k=top_k) as search_span, self._lock:
+            self._evict_expired(time.time())
+            if source_filter is not None:
+                indexes = [self._sources[source_filter]] if source_filter in self._sources else []
+            else:
+                indexes = list(self._sources.values())
+
+            if not indexes:
+                return {"contexts": [], "sources": [], "hits": []}
+
+            if len(indexes) == 1:
+                scores = indexes[0].scores(q)
+                payloads = indexes[0].payloads
+            else:
+                scores = np.concatenate([idx.scores(q) for idx in indexes])
+                payloads = [p for idx in indexes for p in idx.payloads]
+
+            k = min(top_k, len(scores))
+            if k <= 0:
+                return {"contexts": [], "sources": [], "hits": []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            ranked = [(payloads[i], float(scores[i])) for i in top]
+            search_span.set(hits=len(ranked))
+
+        return search_result(ranked)
+
+    def search_batch(self, query_vectors, top_k: int = 5, source_filter: str = None) -> list[dict]:
+        """
+        Exact cosine top-k for several queries with one matrix-matrix product.
+        """
+        check_source_filter(source_filter)
+        if len(query_vectors) == 0:
+            return []
+        queries = self._normalize(np.asarray(query_vectors, dtype=np.float32))
+
+        with telemetry.span("vector.search_batch", backend="numpy", top_k=top_k, queries=len(queries)) as search_span, self._lock:
+            self._evict_expired(time.time())
+            if source_filter is not None:
+                indexes = [self._sources[source_filter]] if source_filter in self._sources else []
+            else:
+                indexes = list(self._sources.values())
+
+            if not indexes:
+                return [{"contexts": [], "sources": [], "hits": []} for _ in queries]
+
+            # scores[i, j]: similarity of row i to query j.
+            if len(indexes) == 1:
+                scores = indexes[0].scores(queries.T)
+                payloads = indexes[0].payloads
+            else:
+                scores = np.concatenate([idx.scores(queries.T) for idx in indexes])
+                payloads = [p for idx in indexes for p in idx.payloads]
+
+            k = min(top_k, len(scores))
+            if k <= 0:
+                return [{"contexts": [], "sources": [], "hits": []} for _ in queries]
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            ranked = []
+            for j in range(len(queries)):
+                column = top[:, j][np.argsort(-scores[top[:, j], j])]
+                ranked.append([(payloads[i], float(scores[i, j])) for i in column])
+            search_span.set(hits=sum(len(r) for r in ranked))
+
+        return [search_result(r) for r in ranked]
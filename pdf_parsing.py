@@ -0,0 +1,158 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from chunking import SentenceChunker
+from custom_types import RAGChunkMeta
+
+# --- Chunking configuration ---
+# "llama_index" (SentenceSplitter, exact tokenizer) or "native" (chunking.SentenceChunker:
+# same size/overlap rules with an estimated token count, no llama_index import).
+PDF_CHUNKER = os.getenv("PDF_CHUNKER", "llama_index")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNKERS = ("llama_index", "native")
+
+# --- Parallel parsing configuration ---
+# Worker processes for PDF text extraction and chunking (1 parses in the calling process).
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(os.cpu_count() or 1, 8))))
+# Pages per pool task. Documents (or batches) with fewer pages in total are parsed inline,
+# where the pool's startup and pickling cost would outweigh the parallelism.
+PDF_PARSE_PAGES_PER_TASK = int(os.getenv("PDF_PARSE_PAGES_PER_TASK", "16"))
+
+_splitters = {}
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_splitter(chunker: str = None):
+    chunker = chunker or PDF_CHUNKER
+    if chunker not in _splitters:
+        if chunker == "native":
+            _splitters[chunker] = SentenceChunker(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        elif chunker == "llama_index":
+            # llama_index takes over a second to import, so it is only loaded when the first page is chunked.
+            from llama_index.core.node_parser import SentenceSplitter
+            _splitters[chunker] = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        else:
+            raise ValueError(f"Unknown chunker {chunker!r}, expected one of {CHUNKERS}")
+    return _splitters[chunker]
+
+def locate_chunks(text: str, chunks: list[str], page: int) -> list[RAGChunkMeta]:
+    """
+    Finds each chunk's character span in its page text. Chunks are searched from just past
+    the previous chunk's start, so overlapping chunks resolve in order; a chunk that isn't
+    a verbatim substring gets start=end=-1.
+    """
+    metas = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start < 0:
+            start = text.find(chunk)
+        if start < 0:
+            metas.append(RAGChunkMeta(page=page, start=-1, end=-1))
+            continue
+        metas.append(RAGChunkMeta(page=page, start=start, end=start + len(chunk)))
+        cursor = start + 1
+    return metas
+
+def chunk_page(text: str, page: int, chunker: str = None) -> tuple[list[str], list[RAGChunkMeta]]:
+    if not text:
+        return [], []
+    splitter = get_splitter(chunker)
+    if isinstance(splitter, SentenceChunker):
+        # The native chunker reports offsets itself, so chunks needn't be searched for.
+        spans = splitter.split_spans(text)
+        return [text[start:end] for start, end in spans], [RAGChunkMeta(page=page, start=start, end=end) for start, end in spans]
+    chunks = splitter.split_text(text)
+    return chunks, locate_chunks(text, chunks, page)
+
+def parse_page_range(path: str, start: int, end: int, chunker: str = None) -> tuple[list[str], list[RAGChunkMeta]]:
+    """
+    Extracts and chunks pages [start, end) of a PDF. Runs in pool workers, so it opens the
+    file itself and returns plain picklable results.
+    """
+    import pypdf
+
+    reader = pypdf.PdfReader(path)
+    chunks = []
+    metas = []
+    for page in range(start, min(end, len(reader.pages))):
+        page_chunks, page_metas = chunk_page(reader.pages[page].extract_text(), page, chunker)
+        chunks.extend(page_chunks)
+        metas.extend(page_metas)
+    return chunks, metas
+
+def page_ranges(pages: int, pages_per_task: int) -> list[tuple[int, int]]:
+    tasks = max(1, math.ceil(pages / pages_per_task))
+    step = math.ceil(pages / tasks) if pages else 1
+    return [(start, min(start + step, pages)) for start in range(0, max(pages, 1), step)]
+
+def get_parse_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if PDF_PARSE_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the parent holds gRPC/HTTP clients and threads that don't survive a fork.
+            # Workers only import this module, so they start quickly and stay warm for later uploads.
+            _pool = ProcessPoolExecutor(max_workers=PDF_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _warm_worker() -> int:
+    import pypdf  # noqa: F401
+
+    get_splitter()
+    return os.getpid()
+
+def warm_parse_pool() -> int:
+    """
+    Starts the parse workers and has each import its dependencies ahead of the first
+    upload. Returns the number of worker processes that answered.
+    """
+    pool = get_parse_pool()
+    if pool is None:
+        get_splitter()
+        return 0
+    return len({f.result() for f in [pool.submit(_warm_worker) for _ in range(PDF_PARSE_WORKERS)]})
+
+def _fan_out(pool: ProcessPoolExecutor, paths: list[str], page_counts: list[int], chunker: str | None) -> list[tuple[int, object]]:
+    tasks = [(i, start, end) for i, pages in enumerate(page_counts)
+             for start, end in page_ranges(pages, PDF_PARSE_PAGES_PER_TASK)]
+    return [(i, pool.submit(parse_page_range, paths[i], start, end, chunker)) for i, start, end in tasks]
+
+def _collect(n: int, parts: list[tuple[int, tuple[list[str], list[RAGChunkMeta]]]]) -> list[tuple[list[str], list[RAGChunkMeta]]]:
+    results = [([], []) for _ in range(n)]
+    for i, (chunks, metas) in parts:
+        results[i][0].extend(chunks)
+        results[i][1].extend(metas)
+    return results
+
+def parse_pdfs(paths: list[str], page_counts: list[int], chunker: str = None) -> list[tuple[list[str], list[RAGChunkMeta]]]:
+    """
+    Parses and chunks several PDFs, fanning page ranges of all of them out over the worker
+    pool together. Returns (chunks, metas) per path, in page order. chunker overrides
+    PDF_CHUNKER.
+    """
+    pool = get_parse_pool() if sum(page_counts) > PDF_PARSE_PAGES_PER_TASK else None
+    if pool is None:
+        # Inline, each file is opened once rather than once per page range.
+        return [parse_page_range(path, 0, pages, chunker) for path, pages in zip(paths, page_counts)]
+
+    futures = _fan_out(pool, paths, page_counts, chunker)
+    return _collect(len(paths), [(i, future.result()) for i, future in futures])
+
+async def aparse_pdfs(paths: list[str], page_counts: list[int], chunker: str = None) -> list[tuple[list[str], list[RAGChunkMeta]]]:
+    """
+    parse_pdfs for callers on an event loop: pool tasks are awaited instead of joined, and
+    inline parsing runs in a worker thread, so the loop keeps serving other requests.
+    """
+    pool = get_parse_pool() if sum(page_counts) > PDF_PARSE_PAGES_PER_TASK else None
+    if pool is None:
+        return await asyncio.to_thread(parse_pdfs, paths, page_counts, chunker)
+
+    futures = _fan_out(pool, paths, page_counts, chunker)
+    parts = await asyncio.gather(*(asyncio.wrap_future(future) for _, future in futures))
+    return _collect(len(paths), [(i, part) for (i, _), part in zip(futures, parts)])
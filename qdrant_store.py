@@ -0,0 +1,358 @@
+import asyncio
+import os
+import threading
+import weakref
+import zlib
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig,
+    SearchParams, QuantizationSearchParams, KeywordIndexParams, KeywordIndexType, HnswConfigDiff,
+    PayloadSchemaType, Range, QueryRequest,
+)
+from vector_db import VectorStore, StorageProfile, active_profile, check_source_filter, search_result
+from embedding import EmbeddingSpec, GEMINI_EMBED_MODEL, active_embedding, check_embedding
+import telemetry
+
+# --- Connection configuration ---
+# QDRANT_URL also accepts ":memory:" for Qdrant's in-process local mode.
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "docs")
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "30"))
+
+# --- Tenant layout configuration ---
+# "shared": one collection, "source" indexed as a tenant key.
+# "sharded": sources are spread over QDRANT_SHARDS collections by hash, for very high session counts.
+QDRANT_LAYOUT = os.getenv("QDRANT_LAYOUT", "shared")
+QDRANT_SHARDS = int(os.getenv("QDRANT_SHARDS", "8"))
+# Build HNSW graphs per source only (payload_m) instead of one global graph. Every query
+# in this app is filtered by source, so the global graph is never needed.
+QDRANT_TENANT_HNSW = os.getenv("QDRANT_TENANT_HNSW", "0") == "1"
+
+def _quantization_config(profile: StorageProfile):
+    if profile.quantization == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if profile.quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def _source_filter(source_id: str) -> Filter:
+    return Filter(
+        must=[
+            FieldCondition(
+                key="source",
+                match=MatchValue(value=source_id),
+            )
+        ]
+    )
+
+def _ranked(points):
+    return ((getattr(p, "payload", None) or {}, p.score) for p in points)
+
+_pool_lock = threading.Lock()
+_clients: dict[tuple, QdrantClient] = {}
+# Async clients hold connections bound to the event loop that created them, so they are
+# pooled per loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, AsyncQdrantClient]]" = weakref.WeakKeyDictionary()
+_ready_collections: set[tuple] = set()
+
+def get_client(url: str = None, prefer_grpc: bool = None) -> QdrantClient:
+    """
+    Returns the process-wide client for a URL, creating it on first use.
+    The client keeps its HTTP/gRPC connections alive between calls.
+    """
+    url = url or QDRANT_URL
+    prefer_grpc = QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+    key = (url, prefer_grpc)
+
+    with _pool_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = QdrantClient(location=url, api_key=QDRANT_API_KEY, prefer_grpc=prefer_grpc, timeout=QDRANT_TIMEOUT)
+            _clients[key] = client
+        return client
+
+def get_async_client(url: str = None, prefer_grpc: bool = None) -> AsyncQdrantClient | None:
+    """
+    Returns the running event loop's async client for a URL, or None for ":memory:": a
+    second local client would be a separate, empty database.
+    """
+    url = url or QDRANT_URL
+    if url == ":memory:":
+        return None
+    prefer_grpc = QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+    loop = asyncio.get_running_loop()
+
+    with _pool_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get((url, prefer_grpc))
+        if client is None:
+            client = AsyncQdrantClient(location=url, api_key=QDRANT_API_KEY, prefer_grpc=prefer_grpc, timeout=QDRANT_TIMEOUT)
+            clients[(url, prefer_grpc)] = client
+        return client
+
+class QdrantStorage(VectorStore):
+    def __init__(self, url=None, collection=None, dim=None, prefer_grpc=None, client=None, profile: StorageProfile = None,
+                 layout: str = None, shards: int = None, embedding: EmbeddingSpec = None):
+        self.client = client or get_client(url, prefer_grpc)
+        # An injected client may point anywhere, so the async path is only used with pooled clients.
+        self._async_location = None if client else (url or QDRANT_URL, prefer_grpc)
+        self.collection = collection or QDRANT_COLLECTION
+        self.profile = profile or active_profile()
+        self.layout = layout or QDRANT_LAYOUT
+        self.dim = dim or self.profile.dim
+        self.embedding = (embedding or active_embedding()).model_copy(update={"dim": self.dim})
+
+        if self.layout == "sharded":
+            self.collections = [f"{self.collection}_{i:03d}" for i in range(shards or QDRANT_SHARDS)]
+        elif self.layout == "shared":
+            self.collections = [self.collection]
+        else:
+            raise ValueError(f"Unknown QDRANT_LAYOUT {self.layout!r}, expected 'shared' or 'sharded'")
+
+        for name in self.collections:
+            self._ensure_collection(name)
+
+    def _ensure_collection(self, name: str):
+        # Only the first storage per (client, collection, embedding) in this process checks the collection.
+        ready_key = (id(self.client), name, self.embedding.describe())
+        if ready_key in _ready_collections:
+            return
+
+        if not self.client.collection_exists(name):
+            self.client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE, on_disk=self.profile.on_disk),
+                quantization_config=_quantization_config(self.profile),
+                hnsw_config=HnswConfigDiff(payload_m=16, m=0) if QDRANT_TENANT_HNSW else None,
+                metadata={"embedding": self.embedding.model_dump()},
+            )
+
+        info = self.client.get_collection(name)
+        self._check_embedding(name, info)
+        schema = info.payload_schema or {}
+        if "source" not in schema:
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name="source",
+                field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+            )
+        if "expires_at" not in schema:
+            # Range index so the expiry sweep's filtered delete doesn't scan the collection.
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name="expires_at",
+                field_schema=PayloadSchemaType.FLOAT,
+            )
+        _ready_collections.add(ready_key)
+
+    def _check_embedding(self, name: str, info):
+        """
+        Raises EmbeddingMismatch if the collection's vectors came from another provider,
+        model or dimension. Collections from before the spec was recorded were all built
+        with Gemini; they are stamped on first use.
+        """
+        recorded = (info.config.metadata or {}).get("embedding")
+        legacy = recorded is None
+        recorded = EmbeddingSpec(provider="gemini", model=GEMINI_EMBED_MODEL, dim=0) if legacy else EmbeddingSpec.model_validate(recorded)
+        # The vector size is what the collection actually holds.
+        recorded.dim = info.config.params.vectors.size
+        check_embedding(recorded, self.embedding, f"Qdrant collection {name!r}")
+        if legacy:
+            self.client.update_collection(collection_name=name, metadata={"embedding": self.embedding.model_dump()})
+
+    def collection_for(self, source_id: str) -> str:
+        if len(self.collections) == 1:
+            return self.collections[0]
+        return self.collections[zlib.crc32(source_id.encode("utf-8")) % len(self.collections)]
+
+    def _async_client(self) -> AsyncQdrantClient | None:
+        return get_async_client(*self._async_location) if self._async_location else None
+
+    def _points_by_collection(self, ids, vectors, payloads) -> dict[str, list[PointStruct]]:
+        by_collection: dict[str, list[PointStruct]] = {}
+        for i in range(len(ids)):
+            name = self.collection_for(payloads[i].get("source", ""))
+            by_collection.setdefault(name, []).append(PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i]))
+        return by_collection
+
+    def upsert(self, ids, vectors, payloads):
+        """
+        Uploads vectors to the database.
+        """
+        by_collection = self._points_by_collection(ids, vectors, payloads)
+        with telemetry.span("vector.upsert", backend="qdrant", points=len(ids), collections=len(by_collection)):
+            for name, points in by_collection.items():
+                self.client.upsert(name, points=points)
+
+    async def aupsert(self, ids, vectors, payloads):
+        aclient = self._async_client()
+        if aclient is None:
+            return await super().aupsert(ids, vectors, payloads)
+        by_collection = self._points_by_collection(ids, vectors, payloads)
+        with telemetry.span("vector.upsert", backend="qdrant", points=len(ids), collections=len(by_collection)):
+            for name, points in by_collection.items():
+                await aclient.upsert(name, points=points)
+
+    def delete_by_source(self, source_id: str):
+        """
+        Deletes all vectors associated with a specific source_id.
+        """
+        self.client.delete(
+            collection_name=self.collection_for(source_id),
+            points_selector=_source_filter(source_id),
+        )
+
+    def delete_expired(self, now: float) -> dict[str, str]:
+        """
+        Deletes all expired vectors with one filtered delete per collection.
+        Only each source's first chunk is scrolled to find the files to remove.
+        """
+        expired = Filter(must=[FieldCondition(key="expires_at", range=Range(lt=now))])
+        first_chunks = Filter(must=[
+            FieldCondition(key="expires_at", range=Range(lt=now)),
+            FieldCondition(key="chunk_index", match=MatchValue(value=0)),
+        ])
+
+        removed = {}
+        for name in self.collections:
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=name,
+                    scroll_filter=first_chunks,
+                    with_payload=["source", "pdf_path"],
+                    with_vectors=False,
+                    limit=1000,
+                    offset=offset,
+                )
+                for p in points:
+                    removed[p.payload.get("source", "")] = p.payload.get("pdf_path")
+                if offset is None:
+                    break
+
+            self.client.delete(collection_name=name, points_selector=expired)
+
+        return removed
+
+    def extend_expiry(self, source_id: str, expires_at: float):
+        self.client.set_payload(
+            collection_name=self.collection_for(source_id),
+            payload={"expires_at": expires_at},
+            points=_source_filter(source_id),
+        )
+
+    async def aextend_expiry(self, source_id: str, expires_at: float):
+        aclient = self._async_client()
+        if aclient is None:
+            return await super().aextend_expiry(source_id, expires_at)
+        await aclient.set_payload(
+            collection_name=self.collection_for(source_id),
+            payload={"expires_at": expires_at},
+            points=_source_filter(source_id),
+        )
+
+    def _search_params(self) -> SearchParams | None:
+        if not self.profile.quantization:
+            return None
+        # Oversample candidates from the quantized index, then rescore them with the original vectors.
+        return SearchParams(
+            quantization=QuantizationSearchParams(rescore=self.profile.rescore, oversampling=self.profile.oversampling)
+        )
+
+    def _targets(self, source_filter: str | None) -> list[str]:
+        # A filtered search only touches the source's own shard; an unfiltered one fans out.
+        check_source_filter(source_filter)
+        return [self.collection_for(source_filter)] if source_filter is not None else self.collections
+
+    def _query_requests(self, query_vectors, top_k: int, source_filter: str | None) -> list[QueryRequest]:
+        return [
+            QueryRequest(
+                query=list(q),
+                filter=_source_filter(source_filter) if source_filter is not None else None,
+                params=self._search_params(),
+                with_payload=True,
+                limit=top_k,
+            )
+            for q in query_vectors
+        ]
+
+    @staticmethod
+    def _top(points: list, top_k: int, fanned_out: bool) -> list:
+        return sorted(points, key=lambda p: p.score, reverse=True)[:top_k] if fanned_out else points
+
+    def search(self, query_vector, top_k: int = 5, source_filter: str = None):
+        """
+        Searches for vectors similar to the query vector.
+        If source_filter is provided, restricts search to that specific source_id to ensure user isolation.
+        """
+        targets = self._targets(source_filter)
+        points = []
+        with telemetry.span("vector.search", backend="qdrant", top_k=top_k, collections=len(targets)) as search_span:
+            for name in targets:
+                results = self.client.query_points(
+                    collection_name=name,
+                    query=query_vector,
+                    query_filter=_source_filter(source_filter) if source_filter is not None else None,
+                    search_params=self._search_params(),
+                    with_payload=True,
+                    limit=top_k
+                )
+                points.extend(results.points)
+            search_span.set(hits=len(points))
+        return search_result(_ranked(self._top(points, top_k, len(targets) > 1)))
+
+    async def asearch(self, query_vector, top_k: int = 5, source_filter: str = None) -> dict:
+        aclient = self._async_client()
+        if aclient is None:
+            return await super().asearch(query_vector, top_k, source_filter)
+        targets = self._targets(source_filter)
+        points = []
+        with telemetry.span("vector.search", backend="qdrant", top_k=top_k, collections=len(targets)) as search_span:
+            for name in targets:
+                results = await aclient.query_points(
+                    collection_name=name,
+                    query=query_vector,
+                    query_filter=_source_filter(source_filter) if source_filter is not None else None,
+                    search_params=self._search_params(),
+                    with_payload=True,
+                    limit=top_k
+                )
+                points.extend(results.points)
+            search_span.set(hits=len(points))
+        return search_result(_ranked(self._top(points, top_k, len(targets) > 1)))
+
+    def search_batch(self, query_vectors, top_k: int = 5, source_filter: str = None) -> list[dict]:
+        """
+        Searches for several query vectors with one query_batch_points request per
+        collection (a single round trip for a source-filtered batch).
+        """
+        targets = self._targets(source_filter)
+        requests = self._query_requests(query_vectors, top_k, source_filter)
+        per_query = [[] for _ in requests]
+        with telemetry.span("vector.search_batch", backend="qdrant", top_k=top_k, queries=len(requests),
+                            collections=len(targets)) as search_span:
+            if requests:
+                for name in targets:
+                    for i, response in enumerate(self.client.query_batch_points(collection_name=name, requests=requests)):
+                        per_query[i].extend(response.points)
+            search_span.set(hits=sum(len(points) for points in per_query))
+        return [search_result(_ranked(self._top(points, top_k, len(targets) > 1))) for points in per_query]
+
+    async def asearch_batch(self, query_vectors, top_k: int = 5, source_filter: str = None) -> list[dict]:
+        aclient = self._async_client()
+        if aclient is None:
+            return await super().asearch_batch(query_vectors, top_k, source_filter)
+        targets = self._targets(source_filter)
+        requests = self._query_requests(query_vectors, top_k, source_filter)
+        per_query = [[] for _ in requests]
+        with telemetry.span("vector.search_batch", backend="qdrant", top_k=top_k, queries=len(requests),
+                            collections=len(targets)) as search_span:
+            if requests:
+                for name in targets:
+                    for i, response in enumerate(await aclient.query_batch_points(collection_name=name, requests=requests)):
+                        per_query[i].extend(response.points)
+            search_span.set(hits=sum(len(points) for points in per_query))
+        return [search_result(_ranked(self._top(points, top_k, len(targets) > 1))) for points in per_query]
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+
+RESULT_RETENTION_S = float(os.getenv("RESULT_RETENTION_S", "300"))
+
+class ResultChannel:
+    """
+    Process-local mailbox of function results keyed by Inngest event id.
+    Functions publish when they finish; clients long-poll instead of polling the Inngest API.
+    Results are kept for `retention_s` so a client that connects late still gets them.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, retention_s: float = RESULT_RETENTION_S):
+        self.retention_s = retention_s
+        self._results: dict[str, tuple[float, dict]] = {}
+        self._waiters: dict[str, asyncio.Event] = {}
+        self._waiting: dict[str, int] = {}
+
+    def publish(self, key: str, result: dict):
+        now = time.time()
+        self._prune(now)
+        self._results[key] = (now + self.retention_s, result)
+        waiter = self._waiters.pop(key, None)
+        if waiter is not None:
+            waiter.set()
+
+    def get(self, key: str) -> dict | None:
+        entry = self._results.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    async def wait(self, key: str, timeout: float) -> dict | None:
+        """
+        Returns the result for `key`, waiting up to `timeout` seconds for it to be published.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        waiter = self._waiters.setdefault(key, asyncio.Event())
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                # Runs that fail never publish; don't keep their waiter around.
+                if self._waiters.get(key) is waiter:
+                    del self._waiters[key]
+        return self.get(key)
+
+    def _prune(self, now: float):
+        for key in [k for k, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[key]
@@ -0,0 +1,166 @@
+import asyncio
+import collections
+import contextlib
+import os
+import threading
+import time
+import telemetry
+
+# --- Scheduler configuration ---
+# Priority classes, most urgent first: interactive queries, then bulk ingest.
+PRIORITIES = ("query", "ingest")
+# Embedding requests in flight across the whole worker, and per source_id.
+SCHED_EMBED_CONCURRENCY = int(os.getenv("SCHED_EMBED_CONCURRENCY", "8"))
+SCHED_EMBED_PER_SOURCE = int(os.getenv("SCHED_EMBED_PER_SOURCE", "4"))
+# LLM calls in flight across the whole worker, and per source_id.
+SCHED_LLM_CONCURRENCY = int(os.getenv("SCHED_LLM_CONCURRENCY", "16"))
+SCHED_LLM_PER_SOURCE = int(os.getenv("SCHED_LLM_PER_SOURCE", "4"))
+# Waiting requests per class beyond which new ones are rejected as busy right away.
+SCHED_MAX_QUEUE = {
+    "query": int(os.getenv("SCHED_MAX_QUEUE_QUERY", "64")),
+    "ingest": int(os.getenv("SCHED_MAX_QUEUE_INGEST", "256")),
+}
+# Longest a request may wait for a slot before it is rejected as busy (0: no limit).
+SCHED_MAX_WAIT_S = {
+    "query": float(os.getenv("SCHED_MAX_WAIT_QUERY_S", "10")),
+    "ingest": float(os.getenv("SCHED_MAX_WAIT_INGEST_S", "0")),
+}
+
+class SchedulerBusy(Exception):
+    """
+    Raised instead of queueing when a scheduler's queue is full or a request waited too long.
+    """
+
+    def __init__(self, scheduler: str, priority: str, reason: str):
+        super().__init__(f"{scheduler} scheduler is busy ({priority} {reason.replace('_', ' ')})")
+        self.scheduler = scheduler
+        self.priority = priority
+        self.reason = reason
+
+class _Waiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop, source_id: str | None):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.source_id = source_id
+        self.granted = False
+
+    def wake(self):
+        # The slot may be freed on another thread or event loop (ingest embeds on private loops).
+        self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+class PriorityScheduler:
+    """
+    Admits at most `capacity` concurrent calls, and at most `per_source` of them for one
+    source_id. Waiting calls are served by priority class (PRIORITIES order), first come
+    first served within a class, skipping sources at their limit. A call is rejected with
+    SchedulerBusy when its class already has max_queue waiting or it waits longer than
+    max_wait_s. Thread-safe, and callers may run on different event loops.
+    """
+
+    def __init__(self, name: str, capacity: int, per_source: int = 0, max_queue: dict = None, max_wait_s: dict = None):
+        self.name = name
+        self.capacity = capacity
+        self.per_source = per_source
+        self.max_queue = max_queue or SCHED_MAX_QUEUE
+        self.max_wait_s = max_wait_s or SCHED_MAX_WAIT_S
+        self._lock = threading.Lock()
+        self._queues: dict[str, collections.deque[_Waiter]] = {p: collections.deque() for p in PRIORITIES}
+        self._active = 0
+        self._by_source: dict[str, int] = {}
+        self.shed = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: str, source_id: str = None):
+        await self.acquire(priority, source_id)
+        try:
+            yield
+        finally:
+            self.release(source_id)
+
+    def overloaded(self, priority: str) -> bool:
+        """
+        Whether a new call of this class would be rejected right now.
+        """
+        with self._lock:
+            return len(self._queues[priority]) >= self.max_queue[priority]
+
+    async def acquire(self, priority: str, source_id: str = None):
+        start = time.perf_counter()
+        with self._lock:
+            if self._active < self.capacity and self._source_has_room(source_id):
+                self._grant(source_id)
+                waiter = None
+            elif len(self._queues[priority]) >= self.max_queue[priority]:
+                self.shed += 1
+                telemetry.SCHEDULER_SHED.inc(scheduler=self.name, priority=priority, reason="queue_full")
+                raise SchedulerBusy(self.name, priority, "queue_full")
+            else:
+                waiter = _Waiter(asyncio.get_running_loop(), source_id)
+                self._queues[priority].append(waiter)
+                self._report_depth(priority)
+
+        if waiter is not None:
+            timeout = self.max_wait_s[priority] or None
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except BaseException as e:
+                with self._lock:
+                    if waiter.granted:
+                        # Granted just as the wait ended: hand the slot on.
+                        self._release_locked(source_id)
+                    else:
+                        self._queues[priority].remove(waiter)
+                        self._report_depth(priority)
+                if isinstance(e, asyncio.TimeoutError):
+                    with self._lock:
+                        self.shed += 1
+                    telemetry.SCHEDULER_SHED.inc(scheduler=self.name, priority=priority, reason="timeout")
+                    raise SchedulerBusy(self.name, priority, "timeout") from None
+                raise
+        telemetry.SCHEDULER_WAIT_SECONDS.observe(time.perf_counter() - start, scheduler=self.name, priority=priority)
+
+    def release(self, source_id: str = None):
+        with self._lock:
+            self._release_locked(source_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active": self._active, "queued": {p: len(q) for p, q in self._queues.items()}, "shed": self.shed}
+
+    def _source_has_room(self, source_id: str | None) -> bool:
+        return not (self.per_source and source_id) or self._by_source.get(source_id, 0) < self.per_source
+
+    def _grant(self, source_id: str | None):
+        self._active += 1
+        if source_id:
+            self._by_source[source_id] = self._by_source.get(source_id, 0) + 1
+        telemetry.SCHEDULER_ACTIVE.set(self._active, scheduler=self.name)
+
+    def _release_locked(self, source_id: str | None):
+        self._active -= 1
+        if source_id:
+            remaining = self._by_source[source_id] - 1
+            if remaining:
+                self._by_source[source_id] = remaining
+            else:
+                del self._by_source[source_id]
+        telemetry.SCHEDULER_ACTIVE.set(self._active, scheduler=self.name)
+        self._dispatch()
+
+    def _dispatch(self):
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if self._active >= self.capacity:
+                return
+            for waiter in list(queue):
+                if self._active >= self.capacity:
+                    break
+                if self._source_has_room(waiter.source_id):
+                    queue.remove(waiter)
+                    waiter.granted = True
+                    self._grant(waiter.source_id)
+                    waiter.wake()
+            self._report_depth(priority)
+
+    def _report_depth(self, priority: str):
+        telemetry.SCHEDULER_QUEUE_DEPTH.set(len(self._queues[priority]), scheduler=self.name, priority=priority)
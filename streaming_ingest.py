@@ -0,0 +1,201 @@
+import contextvars
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from data_loader import iter_pdf_chunks, pdf_page_count, embed_texts, load_and_chunk_pdfs, embed_batch_size, EMBED_CONCURRENCY
+from custom_types import RAGIngestProgress, RAGChunkMeta
+import telemetry
+
+# --- Streaming ingest configuration ---
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "64"))
+INGEST_MAX_INFLIGHT_BATCHES = int(os.getenv("INGEST_MAX_INFLIGHT_BATCHES", "2"))
+
+_DONE = object()
+
+class IngestProgressTracker:
+    """
+    Process-wide registry of ingest progress, keyed by source_id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._progress: dict[str, RAGIngestProgress] = {}
+
+    def start(self, source_id: str, pages_total: int = 0):
+        with self._lock:
+            self._progress[source_id] = RAGIngestProgress(source_id=source_id, pages_total=pages_total)
+
+    def update(self, source_id: str, **fields):
+        with self._lock:
+            current = self._progress.get(source_id)
+            if current is not None:
+                self._progress[source_id] = current.model_copy(update=fields)
+
+    def get(self, source_id: str) -> RAGIngestProgress | None:
+        with self._lock:
+            return self._progress.get(source_id)
+
+    def discard(self, source_id: str):
+        with self._lock:
+            self._progress.pop(source_id, None)
+
+progress_tracker = IngestProgressTracker()
+
+def chunk_point_id(source_id: str, ordinal: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source_id}:{ordinal}"))
+
+def chunk_payload(source_id: str, ordinal: int, text: str, meta: RAGChunkMeta = None,
+                  expires_at: float = None, pdf_path: str = None) -> dict:
+    """
+    Point payload for a chunk. Ordinal, page and character offsets let the query side merge
+    overlapping neighbours back into contiguous spans; expires_at and pdf_path drive the
+    expiry sweep.
+    """
+    payload = {"source": source_id, "text": text, "chunk_index": ordinal}
+    if expires_at is not None:
+        payload["expires_at"] = expires_at
+    if pdf_path is not None:
+        payload["pdf_path"] = pdf_path
+    if meta is not None:
+        payload.update({"page": meta.page, "char_start": meta.start, "char_end": meta.end})
+    return payload
+
+def _produce_batches(path: str, source_id: str, batch_chunks: int, out: queue.Queue, stop: threading.Event):
+    """
+    Parses pages into fixed-size chunk batches. Blocks when `out` is full, which bounds
+    how far parsing can run ahead of embedding.
+    """
+    try:
+        batch = []
+        ordinal = 0
+        for page_number, chunks, metas in iter_pdf_chunks(path):
+            if stop.is_set():
+                return
+            for chunk, meta in zip(chunks, metas):
+                batch.append((ordinal, chunk, meta))
+                ordinal += 1
+                if len(batch) >= batch_chunks:
+                    out.put(batch)
+                    batch = []
+            progress_tracker.update(source_id, pages_done=page_number + 1)
+        if batch:
+            out.put(batch)
+        out.put(_DONE)
+    except BaseException as e:
+        out.put(e)
+
+def _upsert_batch(store, ids, vecs, payloads) -> int:
+    store.upsert(ids, vecs, payloads)
+    return len(ids)
+
+def stream_ingest_pdf(path: str, source_id: str, store, batch_chunks: int = None, max_inflight: int = None,
+                      expires_at: float = None) -> int:
+    """
+    Parses, chunks, embeds and upserts a PDF as a pipeline.
+    Parsing runs in a producer thread, embedding in the calling thread and upserts on a
+    single background writer, so the three stages overlap and the first chunks become
+    searchable before the last page is parsed. Returns the number of chunks ingested.
+    """
+    with telemetry.span("ingest.stream", source_id=source_id) as ingest_span:
+        ingested = _stream_ingest(path, source_id, store, batch_chunks, max_inflight, expires_at, ingest_span)
+        ingest_span.set(chunks=ingested)
+    return ingested
+
+def _stream_ingest(path, source_id, store, batch_chunks, max_inflight, expires_at, ingest_span) -> int:
+    batch_chunks = batch_chunks or INGEST_BATCH_CHUNKS
+    batches = queue.Queue(maxsize=max_inflight or INGEST_MAX_INFLIGHT_BATCHES)
+
+    pages_total = pdf_page_count(path)
+    ingest_span.set(pages=pages_total)
+    progress_tracker.start(source_id, pages_total=pages_total)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce_batches, args=(path, source_id, batch_chunks, batches, stop), daemon=True)
+    producer.start()
+
+    ingested = 0
+    pending_upsert = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                texts = [t for _, t, _ in item]
+                vecs = embed_texts(texts, priority="ingest", source_id=source_id)
+                ids = [chunk_point_id(source_id, o) for o, _, _ in item]
+                payloads = [chunk_payload(source_id, o, t, m, expires_at, path) for o, t, m in item]
+
+                # Keep at most one upsert in flight while the next batch is being embedded.
+                if pending_upsert is not None:
+                    ingested += pending_upsert.result()
+                    progress_tracker.update(source_id, chunks_done=ingested)
+                # Run in a copy of this context so the upsert span nests under ingest.stream.
+                pending_upsert = writer.submit(contextvars.copy_context().run, _upsert_batch, store, ids, vecs, payloads)
+
+            if pending_upsert is not None:
+                ingested += pending_upsert.result()
+    except BaseException as e:
+        progress_tracker.update(source_id, status="failed", error=str(e))
+        # Stop the producer and unblock it if it is waiting on a full queue.
+        stop.set()
+        while producer.is_alive():
+            try:
+                batches.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+        raise
+
+    progress_tracker.update(source_id, status="done", chunks_done=ingested)
+    return ingested
+
+def ingest_pdf_batch(files: list[tuple[str, str]], store, expires_at: float = None, window: int = None) -> dict[str, int]:
+    """
+    Ingests several PDFs, given as (pdf_path, source_id) pairs. Page ranges of all files are
+    parsed together on the parse pool, then their chunks are embedded in shared batches
+    (a batch may span files) and upserted window by window, so small files don't each pay
+    for a partly filled embedding request. Returns chunks ingested per source_id.
+    """
+    # One window keeps every concurrent embedding request full.
+    window = window or embed_batch_size() * EMBED_CONCURRENCY
+    paths = [path for path, _ in files]
+    page_counts = [pdf_page_count(path) for path in paths]
+    for (_, source_id), pages in zip(files, page_counts):
+        progress_tracker.start(source_id, pages_total=pages)
+
+    with telemetry.span("ingest.batch", files=len(files), pages=sum(page_counts)) as batch_span:
+        try:
+            parsed = load_and_chunk_pdfs(paths, page_counts)
+            items = []
+            for (path, source_id), pages, (chunks, metas) in zip(files, page_counts, parsed):
+                progress_tracker.update(source_id, status="embedding", pages_done=pages)
+                items.extend((path, source_id, ordinal, text, meta) for ordinal, (text, meta) in enumerate(zip(chunks, metas)))
+
+            ingested = {source_id: 0 for _, source_id in files}
+            for start in range(0, len(items), window):
+                part = items[start:start + window]
+                # Batches may span files, so they count against the first file's per-source limit.
+                vecs = embed_texts([text for _, _, _, text, _ in part], priority="ingest", source_id=part[0][1])
+                store.upsert(
+                    [chunk_point_id(sid, o) for _, sid, o, _, _ in part],
+                    vecs,
+                    [chunk_payload(sid, o, t, m, expires_at, path) for path, sid, o, t, m in part],
+                )
+                for _, source_id, _, _, _ in part:
+                    ingested[source_id] += 1
+                for source_id in {sid for _, sid, _, _, _ in part}:
+                    progress_tracker.update(source_id, chunks_done=ingested[source_id])
+        except BaseException as e:
+            for _, source_id in files:
+                progress_tracker.update(source_id, status="failed", error=str(e))
+            raise
+        batch_span.set(chunks=len(items))
+
+    for _, source_id in files:
+        progress_tracker.update(source_id, status="done", chunks_done=ingested[source_id])
+    return ingested
@@ -1,12 +1,17 @@
 import asyncio
+import contextlib
+import functools
 from pathlib import Path
+import statistics
 import time
 import os
-import base64
+import hashlib
 import requests
 import streamlit as st
 import inngest
 import uuid 
+import json
+from urllib.parse import quote
 from dotenv import load_dotenv
 
 # --- Configuration ---
@@ -18,46 +23,20 @@ if "user_session_id" not in st.session_state:
     # Generate a unique ID for this browser tab/session
     st.session_state.user_session_id = str(uuid.uuid4())
 
-# --- Helper: Load Image as Base64 ---
-def get_base64_of_bin_file(bin_file):
-    try:
-        with open(bin_file, 'rb') as f:
-            data = f.read()
-        return base64.b64encode(data).decode()
-    except FileNotFoundError:
-        return None
+# --- Assets ---
+# Served by Streamlit's static file server (server.enableStaticServing), so the browser
+# fetches the background once and caches it instead of receiving it inline on every rerun.
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+BACKGROUND_IMAGE = "background_image.jpeg"
 
-# --- Custom CSS Injection ---
-def add_custom_css():
-    # Attempt to load local image, fallback to gradient
-    bin_str = get_base64_of_bin_file("/home/ubuntu/RAG/assets/background_image.jpeg")
-    
-    if bin_str:
-        bg_image_css = f"""
-            .stApp {{
-                background-image: url("data:image/jpeg;base64,{bin_str}");
-                background-size: cover;
-                background-position: center;
-                background-attachment: fixed;
-            }}
-        """
-    else:
-        bg_image_css = """
-            .stApp { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
-        """
-
-    st.markdown(f"""
-        <style>
-        /* 1. Apply Background */
-        {bg_image_css}
-
-        /* 2. Global Typography */
-        .stApp, p, h1, h2, h3, label, .stMarkdown {{
+CUSTOM_CSS = """
+        /* 1. Global Typography */
+        .stApp, p, h1, h2, h3, label, .stMarkdown {
             font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif;
             color: #2c3e50 !important;
-        }}
+        }
         
-        h1 {{
+        h1 {
             font-weight: 700;
             letter-spacing: 2px;
             font-size: 3.5rem !important;
@@ -67,24 +46,24 @@ def add_custom_css():
             background-clip: text;
             margin-bottom: 0.5rem !important;
             text-align: center;
-        }}
+        }
         
-        h3 {{
+        h3 {
             color: #667eea !important;
             font-weight: 600;
             margin-bottom: 1.5rem;
-        }}
+        }
         
-        .subtitle {{
+        .subtitle {
             text-align: center;
             color: #5a6c7d !important;
             font-size: 1.1rem;
             margin-bottom: 3rem;
             font-weight: 300;
-        }}
+        }
 
-        /* 3. CONTAINER STYLING */
-        div[data-testid="stVerticalBlockBorderWrapper"] {{
+        /* 2. CONTAINER STYLING */
+        div[data-testid="stVerticalBlockBorderWrapper"] {
             background: rgba(255, 255, 255, 0.35);
             backdrop-filter: blur(12px);
             -webkit-backdrop-filter: blur(12px);
@@ -93,87 +72,146 @@ def add_custom_css():
             box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
             padding: 20px;
             margin-bottom: 20px;
-        }}
+        }
 
-        /* 4. WIDGET STYLING */
-        .stTextInput > div > div > input {{
+        /* 3. WIDGET STYLING */
+        .stTextInput > div > div > input {
             background-color: rgba(255, 255, 255, 0.6);
             border: 2px solid rgba(255,255,255,0.8);
             color: #2c3e50;
             border-radius: 12px;
-        }}
-        .stNumberInput > div > div > input {{
+        }
+        .stNumberInput > div > div > input {
             background-color: #ffffff !important;
             border: 2px solid #ccc !important;
             color: #000000 !important;
             border-radius: 8px;
-        }}
-        .stButton > button {{
+        }
+        .stButton > button {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             border: none;
             width: 100%;
             border-radius: 12px;
             padding: 12px 24px;
             font-weight: 600;
-        }}
-        .stButton > button p {{
+        }
+        .stButton > button p {
             color: #ffffff !important;
-        }}
-        .stButton > button:hover {{
+        }
+        .stButton > button:hover {
              transform: translateY(-2px);
              box-shadow: 0 6px 20px rgba(102, 126, 234, 0.6);
-        }}
+        }
         
-        /* 5. FILE UPLOADER */
-        [data-testid="stFileUploader"] {{
+        /* 4. FILE UPLOADER */
+        [data-testid="stFileUploader"] {
             background-color: transparent !important;
-        }}
-        [data-testid="stFileUploader"] section {{
+        }
+        [data-testid="stFileUploader"] section {
             background-color: transparent !important;
             border: 2px dashed #000 !important; 
-        }}
+        }
         [data-testid="stFileUploader"] label, 
         [data-testid="stFileUploader"] span, 
         [data-testid="stFileUploader"] small, 
-        [data-testid="stFileUploader"] div {{
+        [data-testid="stFileUploader"] div {
             color: #000000 !important;
-        }}
-        [data-testid="stFileUploader"] button {{
+        }
+        [data-testid="stFileUploader"] button {
             color: #ffffff !important;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             border: none;
-        }}
+        }
 
-        /* 6. ANSWER BOX */
-        .answer-box {{
+        /* 5. ANSWER BOX */
+        .answer-box {
             background: rgba(255, 255, 255, 0.85);
             border-left: 5px solid #667eea;
             padding: 20px;
             border-radius: 12px;
             margin-top: 20px;
             animation: fadeIn 0.5s ease-in;
-        }}
+        }
         
-        @keyframes fadeIn {{
-            from {{ opacity: 0; transform: translateY(10px); }}
-            to {{ opacity: 1; transform: translateY(0); }}
-        }}
+        @keyframes fadeIn {
+            from { opacity: 0; transform: translateY(10px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
         
-        .answer-label {{
+        .answer-label {
             font-weight: 700;
             color: #667eea !important;
             font-size: 1.1rem;
             margin-bottom: 10px;
-        }}
+        }
         
         /* Hide Branding */
-        div[data-testid="stSpinner"] {{ border: none !important; background: transparent !important; }}
-        header {{visibility: hidden;}}
-        footer {{visibility: hidden;}}
-        </style>
-    """, unsafe_allow_html=True)
+        div[data-testid="stSpinner"] { border: none !important; background: transparent !important; }
+        header {visibility: hidden;}
+        footer {visibility: hidden;}
+"""
+
+@st.cache_data
+def custom_css() -> str:
+    """
+    The page's style block, built once per process.
+    """
+    if (STATIC_DIR / BACKGROUND_IMAGE).exists():
+        background = f"""
+        .stApp {{
+            background-image: url("app/static/{BACKGROUND_IMAGE}");
+            background-size: cover;
+            background-position: center;
+            background-attachment: fixed;
+        }}
+        """
+    else:
+        background = """
+        .stApp { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
+        """
+    return f"<style>\n{background}\n{CUSTOM_CSS}</style>"
+
+# --- Rerun timings ---
+# Wall time of every full rerun and fragment rerun, kept per session. RAG_SHOW_TIMINGS=1
+# shows them on the page.
+RERUN_TIMINGS_KEPT = 50
+
+def _show_timings() -> bool:
+    return os.getenv("RAG_SHOW_TIMINGS", "0") == "1"
+
+def record_rerun(scope: str, seconds: float):
+    history = st.session_state.setdefault("rerun_timings", [])
+    history.append({"scope": scope, "ms": seconds * 1000, "at": time.time()})
+    del history[:-RERUN_TIMINGS_KEPT]
 
-add_custom_css()
+@contextlib.contextmanager
+def timed_rerun(scope: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_rerun(scope, time.perf_counter() - start)
+
+def timed_fragment(scope: str):
+    """
+    st.fragment that records each of its runs under `scope`. Widgets inside a fragment
+    rerun only the fragment, not the whole page.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with timed_rerun(scope):
+                return fn(*args, **kwargs)
+        return st.fragment(run)
+    return decorate
+
+def render_timings():
+    history = st.session_state.get("rerun_timings", [])
+    by_scope = {}
+    for entry in history:
+        by_scope.setdefault(entry["scope"], []).append(entry["ms"])
+    st.caption(" · ".join(f"{scope}: last {ms[-1]:.0f} ms, median {statistics.median(ms):.0f} ms over {len(ms)}"
+                          for scope, ms in by_scope.items()))
 
 # --- Logic Layer ---
 
@@ -182,11 +220,19 @@ def get_inngest_client() -> inngest.Inngest:
     return inngest.Inngest(app_id="rag_app", is_production=False)
 
 def save_uploaded_pdf(file) -> Path:
+    """
+    Stores the upload under its content hash: users uploading the same filename can't
+    overwrite each other, and identical uploads share one file (and one indexed copy).
+    """
     uploads_dir = Path("uploads")
     uploads_dir.mkdir(parents=True, exist_ok=True)
-    file_path = uploads_dir / file.name
     file_bytes = file.getbuffer()
-    file_path.write_bytes(file_bytes)
+    file_path = uploads_dir / f"{hashlib.sha256(file_bytes).hexdigest()}.pdf"
+    if not file_path.exists():
+        # Write then rename, so a concurrent identical upload never sees a partial file.
+        tmp_path = uploads_dir / f".{uuid.uuid4().hex}.tmp"
+        tmp_path.write_bytes(file_bytes)
+        os.replace(tmp_path, file_path)
     return file_path
 
 async def send_rag_ingest_event(pdf_path: Path, unique_source_id: str) -> None:
@@ -201,6 +247,17 @@ async def send_rag_ingest_event(pdf_path: Path, unique_source_id: str) -> None:
         )
     )
 
+async def send_rag_ingest_batch_event(files: list[tuple[Path, str]]) -> None:
+    client = get_inngest_client()
+    await client.send(
+        inngest.Event(
+            name="rag/ingest_pdf_batch",
+            data={
+                "files": [{"pdf_path": str(path.resolve()), "source_id": source_id} for path, source_id in files],
+            },
+        )
+    )
+
 async def send_rag_query_event(question: str, top_k: int, unique_source_id: str) -> None:
     client = get_inngest_client()
     result = await client.send(
@@ -215,82 +272,230 @@ async def send_rag_query_event(question: str, top_k: int, unique_source_id: str)
     )
     return result[0]
 
+HTTP_POOL_SIZE = int(os.getenv("RAG_HTTP_POOL_SIZE", "32"))
+
 def _inngest_api_base() -> str:
     return os.getenv("INNGEST_API_BASE", "http://127.0.0.1:8288/v1")
 
+def _rag_api_base() -> str:
+    return os.getenv("RAG_API_BASE", "http://127.0.0.1:8000")
+
+def fetch_ingest_progress(source_id: str) -> dict | None:
+    url = f"{_rag_api_base()}/ingest/progress/{quote(source_id, safe='')}"
+    try:
+        resp = get_http_session().get(url, timeout=5)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+    except Exception:
+        return None
+
+def watch_ingest_progress(status_box, source_id: str, timeout_s: float = 300.0, poll_interval_s: float = 0.5) -> dict | None:
+    """
+    Mirrors the backend's streaming ingest progress into the status box until it finishes.
+    """
+    start = time.time()
+    progress = None
+    while time.time() - start < timeout_s:
+        progress = fetch_ingest_progress(source_id) or progress
+        if progress is None and time.time() - start > 10:
+            # Backend isn't streaming (or isn't reachable): nothing to report.
+            return None
+        if progress:
+            if progress["status"] == "done":
+                return progress
+            if progress["status"] == "failed":
+                raise RuntimeError(progress.get("error") or "Ingest failed")
+            status_box.info(
+                f"Indexing... {progress['pages_done']}/{progress['pages_total']} pages parsed, "
+                f"{progress['chunks_done']} chunks searchable"
+            )
+        time.sleep(poll_interval_s)
+    return progress
+
+def _streaming_enabled() -> bool:
+    return os.getenv("RAG_STREAMING", "1") != "0"
+
+def stream_answer_tokens(question: str, top_k: int, unique_source_id: str, meta: dict):
+    """
+    Yields answer text from the backend's SSE endpoint for st.write_stream.
+    The final `done` event (sources, server timings) and client-side TTFT land in `meta`.
+    """
+    start = time.perf_counter()
+    with get_http_session().post(
+        f"{_rag_api_base()}/query/stream",
+        json={"question": question, "top_k": top_k, "source_id": unique_source_id},
+        stream=True,
+        timeout=(5, 120),
+    ) as resp:
+        if resp.status_code == 503:
+            # Shed by the backend's scheduler: say so now instead of waiting on a queue.
+            raise RuntimeError(resp.json().get("detail", "The service is busy."))
+        resp.raise_for_status()
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    meta.setdefault("client_ttft_ms", (time.perf_counter() - start) * 1000)
+                    yield data["text"]
+                elif event == "done":
+                    meta.update(data)
+                elif event == "error":
+                    raise RuntimeError(data.get("detail", "Streaming failed"))
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    # One keep-alive connection pool for every backend and Inngest API call from this server.
+    # Every browser session's script thread shares it, so allow more than requests' default
+    # 10 connections per host.
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 def fetch_runs(event_id: str) -> list[dict]:
     url = f"{_inngest_api_base()}/events/{event_id}/runs"
     try:
-        resp = requests.get(url)
+        resp = get_http_session().get(url, timeout=5)
         resp.raise_for_status()
         data = resp.json()
         return data.get("data", [])
     except Exception:
         return []
 
-def wait_for_run_output(event_id: str, timeout_s: float = 120.0, poll_interval_s: float = 0.5) -> dict:
+def check_run(event_id: str) -> tuple[dict | None, str | None]:
+    """
+    Returns (output, status) from the Inngest API; output is None until the run completes.
+    """
+    runs = fetch_runs(event_id)
+    if not runs:
+        return None, None
+    run = runs[0]
+    status = run.get("status")
+    if status in ("Completed", "Succeeded", "Success", "Finished"):
+        return run.get("output") or {}, status
+    if status in ("Failed", "Cancelled"):
+        raise RuntimeError(f"Function run {status}")
+    return None, status
+
+def wait_for_pushed_result(event_id: str, timeout_s: float, long_poll_s: float = 10.0) -> dict | None:
+    """
+    Waits on the backend's result channel. Between long-polls the Inngest API is checked
+    once, which catches failed runs and runs served by another worker.
+    Returns None if the channel is unreachable so the caller can fall back to polling.
+    """
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        wait = min(long_poll_s, max(deadline - time.time(), 0.0))
+        try:
+            resp = get_http_session().get(
+                f"{_rag_api_base()}/runs/{event_id}/result",
+                params={"timeout": wait},
+                timeout=wait + 5,
+            )
+        except requests.RequestException:
+            return None
+        if resp.status_code == 200:
+            return resp.json()
+        if resp.status_code != 204:
+            return None
+
+        output, _ = check_run(event_id)
+        if output is not None:
+            return output
+    raise TimeoutError("Timed out waiting for run output")
+
+def wait_for_run_output(event_id: str, timeout_s: float = 120.0, poll_interval_s: float = 0.1, max_poll_interval_s: float = 2.0) -> dict:
     start = time.time()
+    output = wait_for_pushed_result(event_id, timeout_s)
+    if output is not None:
+        return output
+
+    # Fallback: poll the Inngest API, backing off while the run is still going.
     last_status = None
     while True:
-        runs = fetch_runs(event_id)
-        if runs:
-            run = runs[0]
-            status = run.get("status")
-            last_status = status or last_status
-            if status in ("Completed", "Succeeded", "Success", "Finished"):
-                return run.get("output") or {}
-            if status in ("Failed", "Cancelled"):
-                raise RuntimeError(f"Function run {status}")
+        output, status = check_run(event_id)
+        if output is not None:
+            return output
+        last_status = status or last_status
         if time.time() - start > timeout_s:
             raise TimeoutError(f"Timed out waiting for run output (last status: {last_status})")
         time.sleep(poll_interval_s)
+        poll_interval_s = min(poll_interval_s * 1.5, max_poll_interval_s)
 
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
 # --- UI Layout ---
+# Each column is a fragment: uploading, ingesting or asking reruns only its own column,
+# and waiting on an answer leaves the rest of the page alone.
 
-st.markdown("<h1>RAG Agent</h1>", unsafe_allow_html=True)
-st.markdown("<p class='subtitle'>Secure Document Analysis • Auto-Deletion Enabled (10m)</p>", unsafe_allow_html=True)
-
-st.markdown("<br>", unsafe_allow_html=True)
-
-col1, col2 = st.columns([1, 2], gap="large")
-
-# LEFT COLUMN: Knowledge Base
-with col1:
+@timed_fragment("knowledge_base")
+def knowledge_base():
     st.markdown("<h3>Knowledge Base</h3>", unsafe_allow_html=True)
     
-    uploaded = st.file_uploader(
-        "Upload Document", 
+    uploaded_files = st.file_uploader(
+        "Upload Documents", 
         type=["pdf"], 
-        accept_multiple_files=False,
+        accept_multiple_files=True,
         label_visibility="collapsed",
-        help="Limit 5MB per file • PDF"
+        help="Limit 5MB per file • PDF • several files are ingested as one batch"
     )
     
-    if uploaded is not None:
-        st.info(f"{uploaded.name}")
+    if uploaded_files:
+        st.info(", ".join(f.name for f in uploaded_files))
         status_box = st.empty()
         
-        if st.button("Ingest Document", use_container_width=True):
-            status_box.info("Saving file...")
-            path = save_uploaded_pdf(uploaded)
-            time.sleep(0.3)
-            
-            # Generate Unique ID for this specific file upload
+        label = "Ingest Document" if len(uploaded_files) == 1 else f"Ingest {len(uploaded_files)} Documents"
+        if st.button(label, use_container_width=True):
+            status_box.info("Saving files...")
+
+            # Generate Unique ID for each uploaded file
             # Combines Session UUID + Filename to ensure total isolation
-            unique_source_id = f"{st.session_state.user_session_id}--{uploaded.name}"
-            
-            # Save this ID to session state so we know what to query later
-            st.session_state.active_source_id = unique_source_id
+            files = [
+                (save_uploaded_pdf(f), f"{st.session_state.user_session_id}--{f.name}")
+                for f in uploaded_files
+            ]
             
             status_box.info("Generating embeddings...")
-            asyncio.run(send_rag_ingest_event(path, unique_source_id))
-            
-            status_box.success("Document added! It will self-destruct in 10 minutes.")
+            if len(files) == 1:
+                asyncio.run(send_rag_ingest_event(*files[0]))
+            else:
+                # One event: the backend parses the files in parallel and embeds their chunks in shared batches.
+                asyncio.run(send_rag_ingest_batch_event(files))
+
+            try:
+                for _, unique_source_id in files:
+                    watch_ingest_progress(status_box, unique_source_id)
+            except RuntimeError as e:
+                status_box.error(f"Error: {e}")
+                return
+
+            # Save the IDs to session state so we know what to query later; the last file becomes active
+            ingested = st.session_state.setdefault("ingested_sources", {})
+            for f, (_, unique_source_id) in zip(uploaded_files, files):
+                ingested[f.name] = unique_source_id
+            st.session_state.active_source_id = files[-1][1]
+
+            if len(files) == 1:
+                status_box.success("Document added! It will self-destruct in 10 minutes.")
+            else:
+                status_box.success(f"{len(files)} documents added! They will self-destruct in 10 minutes.")
             time.sleep(2)
             status_box.empty()
+
+    # Several ingested documents: choose which one questions go to
+    ingested = st.session_state.get("ingested_sources", {})
+    if len(ingested) > 1:
+        names = list(ingested)
+        current = next((n for n, sid in ingested.items() if sid == st.session_state.get("active_source_id")), names[-1])
+        chosen = st.selectbox("Active document", names, index=names.index(current))
+        st.session_state.active_source_id = ingested[chosen]
             
     # Show active session info (optional, for debugging or clarity)
     if "active_source_id" in st.session_state:
@@ -298,8 +503,8 @@ with col1:
     else:
         st.caption("No active document")
 
-# RIGHT COLUMN: Chat Interface
-with col2:
+@timed_fragment("ask_questions")
+def ask_questions():
     with st.container(border=True):
         st.markdown("<h3>Ask Questions</h3>", unsafe_allow_html=True)
         
@@ -331,28 +536,68 @@ with col2:
                 if "active_source_id" not in st.session_state:
                      st.error("Please upload and ingest a document first.")
                 else:
-                    with st.spinner("Searching secure knowledge base..."):
-                        try:
-                            # Pass the Active Source ID to filter results
-                            active_id = st.session_state.active_source_id
-                            
-                            event_id = asyncio.run(send_rag_query_event(question.strip(), int(top_k), active_id))
-                            
-                            output = wait_for_run_output(event_id)
-                            answer = output.get("answer", "")
-                            sources = output.get("sources", [])
-                            
+                    try:
+                        # Pass the Active Source ID to filter results
+                        active_id = st.session_state.active_source_id
+                        answer = None
+                        sources = []
+
+                        if _streaming_enabled():
+                            meta = {}
+                            slot = st.empty()
+                            try:
+                                with slot.container():
+                                    st.markdown("<div class='answer-box'>", unsafe_allow_html=True)
+                                    st.markdown("<div class='answer-label'>Answer</div>", unsafe_allow_html=True)
+                                    answer = st.write_stream(stream_answer_tokens(question.strip(), int(top_k), active_id, meta))
+                                    st.markdown("</div>", unsafe_allow_html=True)
+                                    if meta.get("client_ttft_ms") is not None:
+                                        st.caption(f"First token in {meta['client_ttft_ms']:.0f} ms")
+                                sources = meta.get("sources", [])
+                            except requests.ConnectionError:
+                                # Streaming endpoint unreachable: fall back to the Inngest run below.
+                                slot.empty()
+                                answer = None
+
+                        if answer is None:
+                            with st.spinner("Searching secure knowledge base..."):
+                                event_id = asyncio.run(send_rag_query_event(question.strip(), int(top_k), active_id))
+
+                                output = wait_for_run_output(event_id)
+                                answer = output.get("answer", "")
+                                sources = output.get("sources", [])
+
                             st.markdown("<div class='answer-box'>", unsafe_allow_html=True)
                             st.markdown("<div class='answer-label'>Answer</div>", unsafe_allow_html=True)
                             st.markdown(answer or "No answer could be generated.")
                             st.markdown("</div>", unsafe_allow_html=True)
 
-                            if sources:
-                                st.markdown("**Sources**")
-                                for idx, source in enumerate(sources, 1):
-                                    # Clean up the display name (remove UUID prefix for cleaner UI)
-                                    display_name = source.split("--")[-1] if "--" in source else source
-                                    st.markdown(f"<div class='source-item'>{idx}. {display_name}</div>", unsafe_allow_html=True)
-                                        
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}")
+                        if sources:
+                            st.markdown("**Sources**")
+                            for idx, source in enumerate(sources, 1):
+                                # Clean up the display name (remove UUID prefix for cleaner UI)
+                                display_name = source.split("--")[-1] if "--" in source else source
+                                st.markdown(f"<div class='source-item'>{idx}. {display_name}</div>", unsafe_allow_html=True)
+
+                    except Exception as e:
+                        st.error(f"Error: {str(e)}")
+
+with timed_rerun("page"):
+    st.markdown(custom_css(), unsafe_allow_html=True)
+    st.markdown("<h1>RAG Agent</h1>", unsafe_allow_html=True)
+    st.markdown("<p class='subtitle'>Secure Document Analysis • Auto-Deletion Enabled (10m)</p>", unsafe_allow_html=True)
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    col1, col2 = st.columns([1, 2], gap="large")
+
+    # LEFT COLUMN: Knowledge Base
+    with col1:
+        knowledge_base()
+
+    # RIGHT COLUMN: Chat Interface
+    with col2:
+        ask_questions()
+
+if _show_timings():
+    render_timings()
@@ -0,0 +1,214 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+# --- Tracing configuration ---
+# Append every finished span as one JSON line to this file (unset: no export).
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+
+# Latency buckets (seconds) from a cache hit up to a slow LLM call or a large ingest.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BATCH_SIZE_BUCKETS = (1, 4, 8, 16, 32, 64, 100, 128, 256, 512, 1024)
+
+# Integer span attributes that are also counted per stage in rag_stage_items_total.
+COUNTED_ATTRIBUTES = ("pages", "chunks", "texts", "points", "hits", "tokens_in", "tokens_out", "cache_hits", "cache_misses")
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., count, sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self._metrics.setdefault(name, Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram("rag_stage_duration_seconds", "Wall time per pipeline stage.", ("stage",))
+STAGE_ERRORS = registry.counter("rag_stage_errors_total", "Pipeline stages that raised.", ("stage",))
+STAGE_ITEMS = registry.counter("rag_stage_items_total", "Pages, chunks, texts, points, hits and tokens handled per stage.", ("stage", "item"))
+EMBED_BATCH_SIZE = registry.histogram("rag_embed_batch_size", "Texts per embedding request.", buckets=BATCH_SIZE_BUCKETS)
+EMBED_BATCH_TARGET = registry.gauge("rag_embed_batch_target", "Batch size the embedding autotuner is currently using.", ("provider",))
+CACHE_LOOKUPS = registry.counter("rag_cache_lookups_total", "Embedding and answer cache lookups.", ("cache", "result"))
+SCHEDULER_QUEUE_DEPTH = registry.gauge("rag_scheduler_queue_depth", "Requests waiting for a scheduler slot.", ("scheduler", "priority"))
+SCHEDULER_ACTIVE = registry.gauge("rag_scheduler_active", "Scheduler slots in use.", ("scheduler",))
+SCHEDULER_WAIT_SECONDS = registry.histogram("rag_scheduler_wait_seconds", "Time from request to scheduler slot.", ("scheduler", "priority"))
+SCHEDULER_SHED = registry.counter("rag_scheduler_shed_total", "Requests rejected as busy, by reason (queue_full, timeout).",
+                                  ("scheduler", "priority", "reason"))
+
+# --- Tracing ---
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("rag_current_span", default=None)
+_export_lock = threading.Lock()
+
+class Span:
+    """
+    One timed pipeline stage. Attributes set on it end up in the exported trace, and the
+    integer ones listed in COUNTED_ATTRIBUTES also feed rag_stage_items_total.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_s = 0.0
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "start": self.start, "duration_ms": self.duration_s * 1000, "error": self.error,
+                "attributes": self.attributes}
+
+def _export(span: Span):
+    if not TRACE_EXPORT_PATH:
+        return
+    line = json.dumps(span.to_dict(), default=str)
+    with _export_lock:
+        with open(TRACE_EXPORT_PATH, "a") as f:
+            f.write(line + "\n")
+
+@contextlib.contextmanager
+def span(name: str, trace_id: str = None, **attributes):
+    """
+    Times the enclosed block as stage `name`, nested under the current span if there is
+    one. `trace_id` groups root spans, e.g. all steps of one Inngest run under its event id.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id = parent.trace_id
+    current = Span(name, trace_id or uuid.uuid4().hex, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        current.duration_s = time.perf_counter() - start
+        _current_span.reset(token)
+        STAGE_SECONDS.observe(current.duration_s, stage=name)
+        for item in COUNTED_ATTRIBUTES:
+            value = current.attributes.get(item)
+            if isinstance(value, int) and not isinstance(value, bool) and value:
+                STAGE_ITEMS.inc(value, stage=name, item=item)
+        _export(current)
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+def observe_stage(name: str, seconds: float, **items):
+    """
+    Records a stage measured elsewhere (e.g. summed over many small calls) without a span.
+    """
+    STAGE_SECONDS.observe(seconds, stage=name)
+    for item, value in items.items():
+        if value:
+            STAGE_ITEMS.inc(value, stage=name, item=item)
@@ -1,75 +1,138 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue
+import abc
+import asyncio
+import os
+import threading
+import pydantic
 
-class QdrantStorage:
-    def __init__(self, url="http://localhost:6333", collection="docs", dim=3072):
-        self.client = QdrantClient(url=url, timeout=30)
-        self.collection = collection
+# "qdrant" (see qdrant_store.py) or "numpy" (in-process exact search, see numpy_store.py).
+# Backends are imported when the storage is first created, so importing this module stays cheap.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
 
-        if not self.client.collection_exists(self.collection):
-            self.client.create_collection(
-                collection_name=self.collection,
-                vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
-            )
+class StorageProfile(pydantic.BaseModel):
+    """
+    How vectors are embedded and stored: Matryoshka-reduced dimensionality, optional
+    int8/binary quantization kept in RAM with originals on disk, and query-time
+    oversampling plus rescoring against the originals.
+    """
+    name: str
+    dim: int
+    quantization: str | None = None
+    on_disk: bool = False
+    oversampling: float = 1.0
+    rescore: bool = True
 
+STORAGE_PROFILES = {
+    "full": StorageProfile(name="full", dim=3072),
+    "int8": StorageProfile(name="int8", dim=3072, quantization="int8", on_disk=True, oversampling=2.0),
+    "binary": StorageProfile(name="binary", dim=3072, quantization="binary", on_disk=True, oversampling=3.0),
+    "compact-1536": StorageProfile(name="compact-1536", dim=1536, quantization="int8", on_disk=True, oversampling=2.0),
+    "compact-768": StorageProfile(name="compact-768", dim=768, quantization="int8", on_disk=True, oversampling=2.0),
+}
+
+RAG_STORAGE_PROFILE = os.getenv("RAG_STORAGE_PROFILE", "full")
+
+def active_profile() -> StorageProfile:
+    try:
+        return STORAGE_PROFILES[RAG_STORAGE_PROFILE]
+    except KeyError:
+        raise ValueError(f"Unknown RAG_STORAGE_PROFILE {RAG_STORAGE_PROFILE!r}, expected one of {sorted(STORAGE_PROFILES)}")
+
+def check_source_filter(source_filter: str | None):
+    """
+    None searches every source; a source id restricts the search to it. An empty id is a
+    caller bug (a missing session), and must not silently widen the search to everyone's documents.
+    """
+    if source_filter is not None and not source_filter:
+        raise ValueError("source_filter must be a source id or None, not an empty string")
+
+def search_result(ranked) -> dict:
+    """
+    Builds the search result every backend returns from ranked (payload, score) pairs;
+    payloads without text are skipped.
+    """
+    contexts = []
+    sources = set()
+    hits = []
+
+    for payload, score in ranked:
+        text = payload.get("text", "")
+        if text:
+            contexts.append(text)
+            sources.add(payload.get("source", ""))
+            hits.append({**payload, "score": score})
+
+    return {"contexts": contexts, "sources": list(sources), "hits": hits}
+
+class VectorStore(abc.ABC):
+    """
+    Interface the pipeline uses for vector storage; every backend returns search results
+    as {"contexts": [...], "sources": [...], "hits": [payload + score, ...]}.
+    """
+
+    @abc.abstractmethod
     def upsert(self, ids, vectors, payloads):
-        """
-        Uploads vectors to the database.
-        """
-        points = [PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i]) for i in range(len(ids))]
-        self.client.upsert(self.collection, points=points)
+        ...
 
+    @abc.abstractmethod
     def delete_by_source(self, source_id: str):
+        ...
+
+    @abc.abstractmethod
+    def search(self, query_vector, top_k: int = 5, source_filter: str = None) -> dict:
+        ...
+
+    def search_batch(self, query_vectors, top_k: int = 5, source_filter: str = None) -> list[dict]:
         """
-        Deletes all vectors associated with a specific source_id.
-        Enforces 10-minute TTL cleanup.
+        One search result per query vector. Backends override this to answer all queries
+        in a single round trip or matrix product.
         """
-        self.client.delete(
-            collection_name=self.collection,
-            points_selector=Filter(
-                must=[
-                    FieldCondition(
-                        key="source",
-                        match=MatchValue(value=source_id),
-                    )
-                ]
-            ),
-        )
-
-    def search(self, query_vector, top_k: int = 5, source_filter: str = None):
+        return [self.search(q, top_k=top_k, source_filter=source_filter) for q in query_vectors]
+
+    # Async variants for callers on the event loop. By default they run the sync method in a
+    # worker thread; backends with an async client override them.
+    async def aupsert(self, ids, vectors, payloads):
+        return await asyncio.to_thread(self.upsert, ids, vectors, payloads)
+
+    async def asearch(self, query_vector, top_k: int = 5, source_filter: str = None) -> dict:
+        return await asyncio.to_thread(self.search, query_vector, top_k, source_filter)
+
+    async def asearch_batch(self, query_vectors, top_k: int = 5, source_filter: str = None) -> list[dict]:
+        return await asyncio.to_thread(self.search_batch, query_vectors, top_k, source_filter)
+
+    async def aextend_expiry(self, source_id: str, expires_at: float):
+        return await asyncio.to_thread(self.extend_expiry, source_id, expires_at)
+
+    @abc.abstractmethod
+    def delete_expired(self, now: float) -> dict[str, str]:
         """
-        Searches for vectors similar to the query vector.
-        If source_filter is provided, restricts search to that specific source_id to ensure user isolation.
+        Deletes every vector whose `expires_at` payload is before `now`.
+        Returns {source_id: pdf_path} for the sources that were removed.
         """
-        query_filter = None
-        if source_filter:
-            query_filter = Filter(
-                must=[
-                    FieldCondition(
-                        key="source",
-                        match=MatchValue(value=source_filter)
-                    )
-                ]
-            )
-
-        results = self.client.query_points(
-            collection_name=self.collection,
-            query=query_vector,
-            query_filter=query_filter,
-            with_payload=True,
-            limit=top_k
-        )
-
-        contexts = []
-        sources = set()
-
-        for r in results.points:
-            payload = getattr(r, "payload", None) or {}
-            text = payload.get("text", "")
-            source = payload.get("source", "")
-
-            if text:
-                contexts.append(text)
-                sources.add(source)
-
-        return {"contexts": contexts, "sources": list(sources)}
\ No newline at end of file
+
+    @abc.abstractmethod
+    def extend_expiry(self, source_id: str, expires_at: float):
+        ...
+
+_storage_lock = threading.Lock()
+_storage = None
+
+def _create_storage(backend: str) -> VectorStore:
+    if backend == "qdrant":
+        from qdrant_store import QdrantStorage
+        return QdrantStorage()
+    if backend == "numpy":
+        from numpy_store import NumpyVectorStore
+        return NumpyVectorStore()
+    raise ValueError(f"Unknown VECTOR_BACKEND {backend!r}, expected 'qdrant' or 'numpy'")
+
+def get_storage() -> VectorStore:
+    """
+    Returns the shared storage layer, so steps don't pay for a new connection and a
+    collection check on every call.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _create_storage(VECTOR_BACKEND)
+    return _storage